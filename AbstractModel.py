@@ -1,9 +1,12 @@
+import logging
 from dataclasses import dataclass
 from typing import Callable, Any, Optional
 
 from PyQt6.QtCore import QAbstractTableModel, Qt, QModelIndex
 from PyQt6.QtWidgets import QTableView, QHeaderView, QStyledItemDelegate
 
+log = logging.getLogger(__name__)
+
 
 class DelegateBase(QStyledItemDelegate):
     def can_edit(self, index: QModelIndex):
@@ -11,6 +14,8 @@ class DelegateBase(QStyledItemDelegate):
 
 
 class AbstractModel(QAbstractTableModel):
+    SortRole = Qt.ItemDataRole.UserRole  # proxies sort on this: `Column.sort`, or the displayed value
+
     @dataclass
     class Column:
         name: str
@@ -18,6 +23,8 @@ class AbstractModel(QAbstractTableModel):
         hint: QHeaderView.ResizeMode = QHeaderView.ResizeMode.ResizeToContents
         align: Qt.AlignmentFlag = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
         delegate: Optional[DelegateBase] = None
+        sort: Optional[Callable[[Any], Any]] = None  # sort key, when the displayed value does not sort right
+        icon: Optional[Callable[[Any], Any]] = None  # decoration (e.g. a `Thumbnails` pixmap)
 
     def __init__(self, columns: [Column]):
         self._columns: [AbstractModel.Column] = columns
@@ -34,8 +41,20 @@ class AbstractModel(QAbstractTableModel):
                     row = self._rows[index.row()]
                     return self._columns[index.column()].func(row)
                 except KeyError:
-                    print(f'ERROR: unknown item  in row {row}')
+                    log.error('unknown item in row %s', row)
                     return '*** UNKNOWN ***'
+            case AbstractModel.SortRole:
+                column = self._columns[index.column()]
+                try:
+                    return (column.sort or column.func)(self._rows[index.row()])
+                except KeyError:
+                    return None
+            case Qt.ItemDataRole.DecorationRole:
+                if (icon := self._columns[index.column()].icon) is not None:
+                    try:
+                        return icon(self._rows[index.row()])
+                    except KeyError:
+                        return None
             case Qt.ItemDataRole.TextAlignmentRole:
                 return self._columns[index.column()].align
             case Qt.ItemDataRole.ToolTipRole:
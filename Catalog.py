@@ -0,0 +1,444 @@
+"""
+Compiled item catalog.
+
+`Fandom.py` (produced by ScrapeFandom) is a 1.5 MB module literal whose import
+compiles and executes 1,821 dicts, then fixes up item types and descriptions.
+`Items.py` adds a 'tag' and an 'effect' to a few hundred of them and
+`ITEMS.py` is the game's own list of item numbers and names; the optional
+`Sheets.py` (see `SpriteSheets`) locates items in shared composite images.
+`build()` merges them once (see `merge()`) and writes the result to
+`resources/catalog.bin`, a compact memory mappable file:
+
+    header   magic, marshal version, item count, offsets of the other sections
+    types    marshalled lists of the (fixed up) type names and of the tags
+    index    one fixed size record per item: ID, wiki id, type number, tag number,
+             sources, name span, entry span
+    columns  numeric columns (see `columns`), one array of item count values each
+    names    UTF-8 item names, back to back
+    entries  marshalled item dicts (as in `Fandom._all_items`), back to back
+
+At runtime only the header, the type table and the index are read; each item
+dict is decoded on first access. The public API mirrors `Fandom`:
+`all_by_id`, `all_by_name`, `is_armor()`, `is_weapon()`, `is_equipment()`;
+secondary indexes are `all_by_wiki_id`, `ids_by_type()` and `ids_by_tag()`.
+Items known only to the game are in `all_by_id`, not in `all_by_name`.
+The catalog is (re)built automatically if missing or older than its sources.
+
+The 'Weight', 'BuyValue', 'SellValue' and 'ForgeryCost' display strings
+('0.22', '1,100 G', '250 RC', '? G', ...) are parsed at build time into typed
+columns, mapped from the file without copy: `column()` returns one as a
+`memoryview` indexed like the catalog (see `_Index.row()`), `number()` the
+value of a single item. Unknown values are `NaN` (weight) or `NULL`.
+The 'usable' column packs who can use each item (see `usable_mask()`).
+"""
+import logging
+import marshal
+import math
+import mmap
+import re
+import struct
+from array import array
+from collections.abc import Mapping
+from os import path, replace
+
+log = logging.getLogger(__name__)
+
+_here = path.dirname(path.realpath(__file__))
+_sources = [path.join(_here, x) for x in ('Fandom.py', 'Items.py', 'ITEMS.py', 'Sheets.py')]
+catalog_file = path.join(_here, 'resources', 'catalog.bin')
+
+_MAGIC = b'DDDAcat4'
+_HEADER = struct.Struct('<8sIIIIIII')  # magic, marshal version, count, types, index, columns, names, entries
+_INDEX = struct.Struct('<iiHHHIHII')   # ID, id, type, tag, sources, name offset, name length, entry offset, entry length
+
+# bits of the sources of an item (see `merge()`)
+FROM_FANDOM = 1
+FROM_ITEMS = 2
+FROM_GAME = 4
+
+NULL = -1                    # unknown value in integer columns
+currencies = ('G', 'RC')     # values of the '*_currency' columns
+
+# column name: (array typecode, source field); every value column has a 'B' '<name>_currency' companion
+columns = {
+    'weight': ('d', 'Weight'),
+    'buy_value': ('i', 'BuyValue'),
+    'sell_value': ('i', 'SellValue'),
+    'forgery_cost': ('i', 'ForgeryCost'),
+}
+# bits of the 'usable' column: one per vocation (in `Vocations` ID order), then one per sex
+vocations = ('Fighter', 'Strider', 'Mage', 'Mystic Knight', 'Assassin', 'Magick Archer', 'Warrior', 'Ranger',
+             'Sorcerer')
+sexes = ('MALE', 'FEMALE')
+USABLE_ALL = (1 << (len(vocations) + len(sexes))) - 1
+_usable_bits = {x.casefold(): n for n, x in enumerate(vocations + sexes)}
+_usable_bits['magick knight'] = _usable_bits['mystic knight']  # misspelt in a few Fandom entries
+
+_number = re.compile(r'(\d[\d,.]*)\s*(G|RC|Rift Crystal)?')
+
+armor_types = frozenset([
+    'Arms Armor',
+    'Chest Clothing',
+    'Cloak',
+    'Head Armor',
+    'Leg Armor',
+    'Leg Clothing',
+    'Torso Armor',
+])
+
+weapon_types = frozenset([
+    'Archistaves',
+    'Daggers',
+    'Longbows',
+    'Longswords',
+    'Maces',
+    'Magick Bows',
+    'Magick Shields',
+    'Shields',
+    'Shortbows',
+    'Staves',
+    'Swords',
+    'Warhammers',
+])
+
+
+def parse_weight(text) -> float:
+    """'0.22' -> 0.22, the first of alternatives ('1.33/2.13'), NaN if unknown."""
+    m = _number.search(text) if isinstance(text, str) else None
+    return float(m.group(1).replace(',', '')) if m else math.nan
+
+
+def parse_value(text) -> tuple[int, int]:
+    """
+    Parse a price such as '1,100 G', '2.625 G' or '250 RC'.
+
+    :return: (amount, currency number in `currencies`), amount is `NULL` if unknown ('? G', 'N/A', ...)
+    """
+    m = _number.search(text) if isinstance(text, str) else None
+    if m is None:
+        return NULL, 0
+    amount = re.sub(r'[,.]', '', m.group(1))  # '.' is only ever a thousands separator here
+    return int(amount), 0 if m.group(2) in (None, 'G') else 1
+
+
+def usable_bit(name: str) -> int:
+    """Bit of vocation or sex `name` (case insensitive) in the 'usable' column."""
+    if (n := _usable_bits.get(name.casefold())) is None:
+        raise ValueError(f'ERROR: unknown vocation or sex "{name}"')
+    return 1 << n
+
+
+def usable_mask(usable) -> int:
+    """
+    Pack a Fandom 'usable' dict ({vocation: bool, ..., 'sex': 'BOTH'}) into bits.
+
+    Only explicit `False` vocations are unusable; no dict, no 'sex' or 'BOTH' mean usable by anyone.
+    """
+    mask = USABLE_ALL
+    for key, value in (usable or {}).items():
+        if key == 'sex':
+            if value in sexes:
+                mask &= ~(usable_bit('MALE') | usable_bit('FEMALE')) | usable_bit(value)
+        elif value is False:
+            mask &= ~usable_bit(key)
+    return mask
+
+
+def _layout() -> list[tuple[str, str]]:
+    """(name, typecode) of every column, in file order: wider values first, then usability and currencies."""
+    return ([(name, code) for name, (code, field) in columns.items()] + [('usable', 'H')] +
+            [(f'{name}_currency', 'B') for name, (code, field) in columns.items() if code == 'i'])
+
+
+def _columns(items: list[dict]) -> bytes:
+    out = {}
+    for name, (code, field) in columns.items():
+        if code == 'd':
+            out[name] = array('d', [parse_weight(x.get(field)) for x in items])
+        else:
+            values = [parse_value(x.get(field)) for x in items]
+            out[name] = array('i', [x[0] for x in values])
+            out[f'{name}_currency'] = array('B', [x[1] for x in values])
+    out['usable'] = array('H', [usable_mask(x.get('usable')) for x in items])
+    return b''.join(out[name].tobytes() for name, code in _layout())
+
+
+def _column_views(buf, start: int, count: int) -> dict[str, memoryview]:
+    view = memoryview(buf)
+    out = {}
+    for name, code in _layout():
+        size = array(code).itemsize * count
+        out[name] = view[start:start + size].cast(code)
+        start += size
+    return out
+
+
+def _loose(name: str) -> str:
+    # "Tagilus' Miracle" and "Tagilus's Miracle" are the same item
+    return re.sub(r"'s?(?!\w)", '', name).casefold()
+
+
+def merge() -> list[tuple[dict, int]]:
+    """
+    Merge the three item tables into one list of (entry, sources) pairs.
+
+    Entries are the `Fandom._all_items` dicts, in order, plus:
+        'tag', 'effect'  from `Items._item`, matched by name (its 'id' is wrong for a few items)
+        'game_name'      the name of 'ID' in `ITEMS.id_to_item` (with its `<ITNO n>` references resolved)
+        'sheet', 'cell'  the sprite sheet image file and (x, y, width, height) of the item in it,
+                         from `Sheets.cells` if `SpriteSheets.py` was run, matched by name
+    followed by an entry of 'Type' 'Unknown' for every item number known only to the game.
+    """
+    import Fandom  # fixups are applied at import
+    import Items
+    import ITEMS
+    try:
+        import Sheets
+        cells = {_loose(k): v for k, v in Sheets.cells.items()}
+    except ImportError:  # generated by `SpriteSheets.py`
+        cells = {}
+
+    extra_by_name = {_loose(x['Name']): x for x in Items._item}
+    out = []
+    for item in Fandom._all_items:
+        item = dict(item)
+        sources = FROM_FANDOM
+        if (extra := extra_by_name.get(_loose(item['Name']))) is not None:
+            item['tag'] = extra['tag']
+            item['effect'] = extra['effect']
+            sources |= FROM_ITEMS
+        if (cell := cells.get(_loose(item['Name']))) is not None:
+            item['sheet'], item['cell'] = cell
+        if (game_name := ITEMS.id_to_item.get(item['ID'])) is not None:
+            item['game_name'] = game_name
+            sources |= FROM_GAME
+        out.append((item, sources))
+    documented = {x['ID'] for x in Fandom._all_items}
+    for idx, name in ITEMS.id_to_item.items():
+        if idx not in documented:
+            out.append(({'ID': idx, 'Name': name, 'Type': 'Unknown', 'img': None,
+                         'desc': 'This item was not found in "dragonsdogma.fandom.com"', 'usable': None,
+                         'id': idx, 'game_name': name}, FROM_GAME))
+    return out
+
+
+def build(fname: str = catalog_file) -> bytes:
+    """
+    Compile `Fandom.py`, `Items.py` and `ITEMS.py` into the binary catalog format.
+
+    :param fname: file to write, `None` to only return the compiled bytes
+    :return: the compiled catalog
+    """
+    merged = merge()
+    items = [x[0] for x in merged]
+    types = sorted({x['Type'] for x in items})
+    type_no = {t: n for n, t in enumerate(types)}
+    tags = [''] + sorted({x['tag'] for x in items if 'tag' in x})
+    tag_no = {t: n for n, t in enumerate(tags)}
+    index = []
+    names = bytearray()
+    entries = bytearray()
+    for item, sources in merged:
+        name = item['Name'].encode()
+        entry = marshal.dumps(item)
+        index.append(_INDEX.pack(item['ID'], item.get('id', item['ID']), type_no[item['Type']],
+                                 tag_no[item.get('tag', '')], sources,
+                                 len(names), len(name), len(entries), len(entry)))
+        names += name
+        entries += entry
+    types = marshal.dumps((types, tags))
+    types += bytes(-(_HEADER.size + len(types)) % 8)
+    index = b''.join(index)
+    index += bytes(-len(index) % 8)  # keep the columns aligned
+    cols = _columns(items)
+    o_types = _HEADER.size
+    o_index = o_types + len(types)
+    o_columns = o_index + len(index)
+    o_names = o_columns + len(cols)
+    o_entries = o_names + len(names)
+    data = b''.join([_HEADER.pack(_MAGIC, marshal.version, len(items),
+                                  o_types, o_index, o_columns, o_names, o_entries),
+                     types, index, cols, names, entries])
+    if fname:
+        tmp = fname + '.tmp'
+        with open(tmp, 'wb') as fo:
+            fo.write(data)
+        replace(tmp, fname)
+    return data
+
+
+class _Catalog:
+    def __init__(self, buf):
+        self._buf = buf
+        magic, version, count, o_types, o_index, o_columns, o_names, o_entries = _HEADER.unpack_from(buf)
+        if magic != _MAGIC or version != marshal.version:
+            raise ValueError('ERROR: incompatible catalog file')
+        self.types, self.tags = marshal.loads(buf[o_types:o_index])
+        self._index = list(_INDEX.iter_unpack(buf[o_index:o_index + _INDEX.size * count]))
+        self.columns = _column_views(buf, o_columns, count)
+        self._o_entries = o_entries
+        self._entries = [None] * count
+        names = bytes(buf[o_names:o_entries])
+        self.names = [names[r[5]:r[5] + r[6]].decode() for r in self._index]
+        self.by_id = {r[0]: n for n, r in enumerate(self._index)}
+        # game-only entries ('Unknown Item' stands for 209 IDs) are found by ID only
+        self.by_name = {name: n for n, name in enumerate(self.names) if self._index[n][4] & FROM_FANDOM}
+        self.by_wiki_id = {}
+        self.by_type: dict[str, list[int]] = {}
+        self.by_tag: dict[str, list[int]] = {}
+        for n, r in enumerate(self._index):
+            self.by_wiki_id.setdefault(r[1], n)
+            self.by_type.setdefault(self.types[r[2]], []).append(n)
+            if r[3]:
+                self.by_tag.setdefault(self.tags[r[3]], []).append(n)
+
+    def entry(self, n: int) -> dict:
+        entry = self._entries[n]
+        if entry is None:
+            r = self._index[n]
+            start = self._o_entries + r[7]
+            entry = self._entries[n] = marshal.loads(self._buf[start:start + r[8]])
+        return entry
+
+    def type_no(self, n: int) -> int:
+        return self._index[n][2]
+
+    def type(self, n: int) -> str:
+        return self.types[self._index[n][2]]
+
+    def sources(self, n: int) -> int:
+        """`FROM_FANDOM`, `FROM_ITEMS` and `FROM_GAME` bits of the tables item `n` comes from."""
+        return self._index[n][4]
+
+
+class _Index(Mapping):
+    """Read-only mapping decoding catalog entries on access."""
+    def __init__(self, catalog: _Catalog, keys: dict):
+        self._catalog = catalog
+        self._keys = keys
+
+    def __getitem__(self, key):
+        return self._catalog.entry(self._keys[key])
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def row(self, key) -> int:
+        """Position of `key` in the catalog."""
+        return self._keys[key]
+
+
+def _stale() -> bool:
+    if not path.isfile(catalog_file):
+        return True
+    built = path.getmtime(catalog_file)
+    return any(path.isfile(x) and path.getmtime(x) > built for x in _sources)
+
+
+def _load() -> _Catalog:
+    if _stale():
+        try:
+            build()
+        except OSError as e:
+            log.warning('cannot write "%s" (%s), using an in-memory catalog', catalog_file, e)
+            return _Catalog(build(None))
+    with open(catalog_file, 'rb') as fi:
+        buf = mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _Catalog(buf)
+    except ValueError:
+        return _Catalog(build())
+
+
+_catalog = None
+
+
+def catalog() -> _Catalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = _load()
+    return _catalog
+
+
+def __getattr__(name):
+    # lazily create `all_by_id` and `all_by_name` on first access
+    if name == 'all_by_id':
+        value = _Index(catalog(), catalog().by_id)
+    elif name == 'all_by_name':
+        value = _Index(catalog(), catalog().by_name)
+    elif name == 'all_by_wiki_id':
+        value = _Index(catalog(), catalog().by_wiki_id)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    globals()[name] = value
+    return value
+
+
+def bitset(rows) -> int:
+    """Pack row numbers into an int, bit n standing for row n."""
+    mask = bytearray()
+    for n in rows:
+        if (i := n >> 3) >= len(mask):
+            mask.extend(bytes(i + 1 - len(mask)))
+        mask[i] |= 1 << (n & 7)
+    return int.from_bytes(mask, 'little')
+
+
+def bitset_flags(bits: int, size: int) -> str:
+    """Unpack a bitset of `size` rows into a '0'/'1' string, whose indexing is cheaper than shifting a long int."""
+    return format(bits, 'b').zfill(size)[::-1]
+
+
+def column(name: str) -> memoryview:
+    """Numeric column `name` (a key of `columns`, its '_currency' companion or 'usable'), indexed by catalog row."""
+    return catalog().columns[name]
+
+
+def number(x, name: str):
+    """Value of column `name` for item `x` (ID or name), `None` if unknown."""
+    cat = catalog()
+    value = cat.columns[name][cat.by_id[x] if isinstance(x, int) else cat.by_name[x]]
+    if value == NULL or value != value:  # NaN
+        return None
+    return value
+
+
+def ids_by_type(typ: str) -> list[int]:
+    """IDs of the items of type `typ`, in catalog order."""
+    cat = catalog()
+    return [cat._index[n][0] for n in cat.by_type.get(typ, ())]
+
+
+def ids_by_tag(tag: str) -> list[int]:
+    """IDs of the items with `Items` tag `tag` ('curative', 'arrow', ...), in catalog order."""
+    cat = catalog()
+    return [cat._index[n][0] for n in cat.by_tag.get(tag, ())]
+
+
+def item_type(x) -> str:
+    """Type of item `x` (ID or name), without decoding its entry."""
+    cat = catalog()
+    return cat.type(cat.by_id[x] if isinstance(x, int) else cat.by_name[x])
+
+
+def is_armor(x):
+    return item_type(x) in armor_types
+
+
+def is_weapon(x):
+    return item_type(x) in weapon_types
+
+
+def is_equipment(x):
+    return is_armor(x) or is_weapon(x)
+
+
+if __name__ == '__main__':
+    build()
+    print(f'{catalog_file}: {len(catalog().names)} items, {path.getsize(catalog_file)} bytes')
@@ -0,0 +1,106 @@
+"""
+Checksum engines for `DDDA.sav`.
+
+The header `hash` field is a CRC-32 (reflected polynomial 0xedb88320, initial
+value 0xffffffff) computed over the compressed payload, but *without* the
+customary final XOR with 0xffffffff.
+
+Several interchangeable engines are provided; all of them must give the same
+digest as `crc32_reference()`, which is the original bit-by-bit algorithm.
+Each engine is verified against the reference at import time and the fastest
+one passing the check is selected as `crc32()`.
+"""
+import logging
+import struct
+import zlib
+
+log = logging.getLogger(__name__)
+
+_POLY = 0xedb88320
+
+
+def crc32_reference(buf) -> int:
+    """Bit-by-bit reference implementation (slow, used for self-check)."""
+    crc = 0xffffffff
+    for b in buf:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ _POLY if crc & 1 else crc >> 1
+    return crc
+
+
+def crc32_zlib(buf) -> int:
+    """Fast path: `zlib.crc32()` with the final XOR undone."""
+    return zlib.crc32(buf) ^ 0xffffffff
+
+
+def _make_tables():
+    t0 = []
+    for n in range(256):
+        c = n
+        for _ in range(8):
+            c = (c >> 1) ^ _POLY if c & 1 else c >> 1
+        t0.append(c)
+    tables = [t0]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append([(prev[n] >> 8) ^ t0[prev[n] & 0xff] for n in range(256)])
+    return tables
+
+
+_T0, _T1, _T2, _T3, _T4, _T5, _T6, _T7 = _make_tables()
+
+
+def crc32_slicing8(buf) -> int:
+    """Pure Python slicing-by-8 table implementation (fallback if zlib misbehaves)."""
+    crc = 0xffffffff
+    mv = memoryview(buf).cast('B')
+    n = len(mv) & ~7
+    for lo, hi in struct.iter_unpack('<II', mv[:n]):
+        crc ^= lo
+        crc = (_T7[crc & 0xff] ^ _T6[(crc >> 8) & 0xff] ^
+               _T5[(crc >> 16) & 0xff] ^ _T4[crc >> 24] ^
+               _T3[hi & 0xff] ^ _T2[(hi >> 8) & 0xff] ^
+               _T1[(hi >> 16) & 0xff] ^ _T0[hi >> 24])
+    for b in mv[n:]:
+        crc = (crc >> 8) ^ _T0[(crc ^ b) & 0xff]
+    return crc
+
+
+# in order of preference
+_candidates = {
+    'zlib': crc32_zlib,
+    'slicing8': crc32_slicing8,
+}
+
+engines = {}
+
+
+def _self_check():
+    vectors = [b'', b'\x00', b'123456789', bytes(range(256)) * 3 + b'tail']
+    for name, func in _candidates.items():
+        if all(func(v) == crc32_reference(v) for v in vectors):
+            engines[name] = func
+        else:
+            log.warning('checksum engine "%s" failed self-check, disabled', name)
+    engines['reference'] = crc32_reference
+
+
+_self_check()
+
+crc32 = next(iter(engines.values()))
+
+
+def engine() -> str:
+    """Name of the engine currently used by `crc32()`."""
+    return next(k for k, v in engines.items() if v is crc32)
+
+
+def set_engine(name: str):
+    """
+    Select the engine used by `crc32()`.
+
+    It may `raise` `KeyError` if the engine is unknown or failed self-check.
+    """
+    global crc32
+    crc32 = engines[name]
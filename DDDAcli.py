@@ -0,0 +1,232 @@
+"""
+Headless command line interface to `DDDA.sav` savefiles.
+
+Run as:
+    python DDDAcli.py [-j N] [--telemetry [--profile] [--tracemalloc]] check FILE|DIR ...
+    python DDDAcli.py [-j N] [--telemetry ...] inspect [--items] FILE|DIR ...
+    python DDDAcli.py [-j N] [--telemetry ...] apply [--output DIR] [--no-backup] SCRIPT FILE|DIR ...
+    python DDDAcli.py [-j N] [--telemetry ...] audit FILE|DIR ...
+
+Directories are searched recursively for `*.sav` files. Files are processed
+in parallel by a pool of `-j` processes (default: one per core) and one JSON
+object per file is printed as soon as it is done, e.g.:
+    {"file": "saves/DDDA.sav", "ok": true, "persons": [...]}
+    {"file": "saves/broken.sav", "ok": false, "error": "ERROR: hash mismatch (...)"}
+With `--telemetry` each object also holds the timings of every loading (and
+saving) stage, see `Telemetry`.
+
+An edit SCRIPT is a JSON list of operations, applied in order, such as:
+    [{"person": "Player", "level": 200, "vocation": 9, "vocation_level": 9},
+     {"person": "Storage", "add": "Wakestone", "num": 10},
+     {"person": "Storage", "remove": 1294}]
+Items are given by ID or name. `audit` reports weight, value, gold forged
+items and duplicates per store (see `Snapshot`, it needs NumPy).
+Everything here is Qt-free.
+"""
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.etree import ElementTree as ET
+
+import Catalog
+import Log
+import Snapshot
+from SaveData import SaveData, Person, backup, MAX_NUM
+from Telemetry import Telemetry
+
+
+def _item(x) -> int:
+    if isinstance(x, str):
+        if x not in Catalog.all_by_name:
+            raise ValueError(f'ERROR: unknown item "{x}"')
+        return Catalog.all_by_name[x]['ID']
+    if x not in Catalog.all_by_id:
+        raise ValueError(f'ERROR: unknown item ID {x}')
+    return x
+
+
+def apply_edits(save: SaveData, script: list[dict]) -> int:
+    """
+    Apply an edit script (see module documentation) to `save`.
+
+    It may `raise` `ValueError` on malformed operations or if there is no room for added items.
+
+    :return: the number of operations applied
+    """
+    for n, op in enumerate(script):
+        if not isinstance(op, dict):
+            raise ValueError(f'ERROR: operation {n}: not a JSON object')
+        op = dict(op)
+        person = save.person(op.pop('person', None))
+        who = person.who
+        if 'add' in op:
+            idx = _item(op.pop('add'))
+            num = int(op.pop('num', 1))
+            if not 1 <= num <= MAX_NUM:
+                raise ValueError(f'ERROR: operation {n}: num {num} is not in range [1..{MAX_NUM}]')
+            if person.add(idx, num) < 0:
+                raise ValueError(f'ERROR: operation {n}: no free slot for {idx} in {who}')
+        elif 'remove' in op:
+            idx = _item(op.pop('remove'))
+            with person.batch():
+                for row in person.rows:
+                    if row.valid and row.item == idx:
+                        person.row_inc(row, -row.num)
+        for attr in ('level', 'vocation', 'vocation_level'):
+            if attr in op:
+                setattr(person, attr, int(op.pop(attr)))
+        if op:
+            raise ValueError(f'ERROR: operation {n}: unknown keys {sorted(op)}')
+    return len(script)
+
+
+def _check(save: SaveData, options: dict) -> dict:
+    return {'header': save.header._asdict()}
+
+
+def _inspect(save: SaveData, options: dict) -> dict:
+    return {'persons': [save.person(who).summary(options.get('items', False)) for who in Person.persons]}
+
+
+def _apply(save: SaveData, options: dict) -> dict:
+    edits = apply_edits(save, options['script'])
+    fname = save.fname
+    if options.get('output'):
+        fname = output_file(fname, options['output'], options.get('root'))
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+    elif options.get('backup', True):
+        backup(fname)
+    save.to_file(fname)
+    return {'edits': edits, 'output': fname}
+
+
+def _audit(save: SaveData, options: dict) -> dict:
+    return {'audit': Snapshot.Snapshot(save).audit()}
+
+
+_commands = {
+    'check': _check,
+    'inspect': _inspect,
+    'apply': _apply,
+    'audit': _audit,
+}
+
+
+def process(command: str, fname: str, options: dict) -> dict:
+    """Run `command` on a single savefile; errors are reported in the result, never raised."""
+    result = {'file': fname, 'ok': False}
+    telemetry = Telemetry(profile=options.get('profile', False), trace=options.get('tracemalloc', False))
+    try:
+        save = SaveData.load(fname, telemetry=telemetry)
+        result.update(_commands[command](save, options))
+        result['ok'] = True
+    except (OSError, ValueError, ET.ParseError) as e:
+        result['error'] = str(e)
+    except Exception as e:  # a bad file must not stop the others
+        result['error'] = f'ERROR: {e!r}'
+    if options.get('telemetry'):
+        result['telemetry'] = telemetry.as_dict()
+    return result
+
+
+def savefiles(paths):
+    """Expand directories in `paths` into the `*.sav` files they contain."""
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                yield from (os.path.join(root, f) for f in sorted(files) if f.lower().endswith('.sav'))
+        else:
+            yield p
+
+
+def output_file(fname: str, output: str, root: str = None) -> str:
+    """Where `apply --output` writes `fname`: its path relative to `root` (its directory by default), under `output`."""
+    fname = os.path.abspath(fname)
+    return os.path.join(output, os.path.relpath(fname, root or os.path.dirname(fname)))
+
+
+def run(command: str, paths, options: dict, jobs: int = None):
+    """
+    Process all savefiles in `paths`, yielding results as they complete.
+
+    It may `raise` `ValueError` if two files would be written to the same `output` file.
+    """
+    files = list(savefiles(paths))
+    if options.get('output') and files:
+        # keep the tree: every save is named DDDA.sav
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(x)) for x in files])
+        options = dict(options, root=root)
+        outputs = {}
+        for fname in files:
+            if (other := outputs.get(dest := output_file(fname, options['output'], root))) is not None:
+                raise ValueError(f'ERROR: "{other}" and "{fname}" would both be written to "{dest}"')
+            outputs[dest] = fname
+    if jobs == 1 or len(files) <= 1:
+        for fname in files:
+            yield process(command, fname, options)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(process, command, fname, options) for fname in files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Query and patch DDDA.sav files in bulk')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--debug', action='store_true', help='enable debug logging (on stderr)')
+    parser.add_argument('--telemetry', action='store_true', help='add per stage timings to each result')
+    parser.add_argument('--profile', action='store_true', help='with --telemetry, add a cProfile of loading')
+    parser.add_argument('--tracemalloc', action='store_true', help='with --telemetry, add memory peaks per stage')
+    sub = parser.add_subparsers(dest='command', required=True)
+    check = sub.add_parser('check', help='verify checksums')
+    check.add_argument('paths', nargs='+')
+    inspect = sub.add_parser('inspect', help='describe player, pawns and storage')
+    inspect.add_argument('--items', action='store_true', help='list the content of every inventory')
+    inspect.add_argument('paths', nargs='+')
+    apply = sub.add_parser('apply', help='apply an edit script and write the savefiles back')
+    apply.add_argument('--output', help='write to this directory (keeping the tree of the inputs) instead of in place')
+    apply.add_argument('--no-backup', dest='backup', action='store_false', help='do not back up files written in place')
+    apply.add_argument('script', help='JSON edit script')
+    apply.add_argument('paths', nargs='+')
+    audit = sub.add_parser('audit', help='weight, value and duplicates per store (needs NumPy)')
+    audit.add_argument('paths', nargs='+')
+    args = parser.parse_args(argv)
+    if args.command == 'audit' and not Snapshot.available():
+        parser.error('audit needs NumPy (pip install numpy)')
+    Log.setup(True if args.debug else None)
+
+    options = {'telemetry': args.telemetry, 'profile': args.profile, 'tracemalloc': args.tracemalloc}
+    if args.command == 'inspect':
+        options['items'] = args.items
+    elif args.command == 'apply':
+        with open(args.script) as fi:
+            options['script'] = json.load(fi)
+        if not isinstance(options['script'], list):
+            parser.error('edit script must be a JSON list')
+        for n, op in enumerate(options['script']):
+            if not isinstance(op, dict):
+                parser.error(f'edit script operation {n} must be a JSON object')
+            if op.get('person') not in Person.persons:
+                parser.error(f'edit script operation {n}: "person" must be one of {", ".join(Person.persons)}')
+        options['output'] = args.output
+        options['backup'] = args.backup
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+
+    failed = 0
+    try:
+        for result in run(args.command, args.paths, options, args.jobs):
+            failed += not result['ok']
+            print(json.dumps(result), flush=True)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
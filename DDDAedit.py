@@ -1,15 +1,24 @@
+import logging
 import sys
 from typing import Optional
 
 from PyQt6 import uic
 from PyQt6.QtCore import pyqtSlot, QSettings, Qt
-from PyQt6.QtGui import QAction, QIcon, QCursor, QPixmap
+from PyQt6.QtGui import QAction, QIcon, QCursor
 from PyQt6.QtWidgets import QMainWindow, QLineEdit, QPlainTextEdit, QComboBox, QPushButton, QTableWidget, \
-    QApplication, QFileDialog, QSplashScreen, QTabWidget, QTableWidgetItem, QHeaderView
+    QApplication, QFileDialog, QSplashScreen, QTabWidget, QTableView, QProgressBar, QToolButton
 
 import DDDAwrapper
+import Log
 import Storage
+from Diagnostics import Diagnostics
+from DiffModel import DiffModel
+from Loader import Loader
 from Pers import Pers
+from PixmapCache import PixmapCache
+from SaveData import SaveData
+
+log = logging.getLogger(__name__)
 
 
 class MainWindow(QMainWindow):
@@ -26,14 +35,13 @@ class MainWindow(QMainWindow):
         self.actionSave: Optional[QAction] = None
         self.actionSavex: Optional[QAction] = None
         self.storage: Optional[Storage.Storage] = None
-        self.diffs: Optional[QTableWidget] = None
+        self.diffs: Optional[QTableView] = None
         uic.loadUi("DDDAedit.ui", self)
         self.wrapper = DDDAwrapper.DDDAwrapper(self)
         self.wrapper.data_changed.connect(self.on_wrapper_data_changed)
-        self.diffs.setHorizontalHeaderLabels(['Line', 'Original', 'Current'])
-        self.diffs.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
-        self.diffs.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.diffs.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.diff_model = DiffModel()
+        self.diffs.setModel(self.diff_model)
+        self.diff_model.set_hints(self.diffs)
 
         self.actionOpen.triggered.connect(self.on_open_triggered)
         self.actionSavex.triggered.connect(self.on_savex_triggered)
@@ -48,29 +56,35 @@ class MainWindow(QMainWindow):
         self.dddasav.setPlaceholderText('Find your save file')
         self.dddasav.addAction(self.edit_action, QLineEdit.ActionPosition.TrailingPosition)
 
+        self.loader: Optional[Loader] = None
+        self._loaders: set[Loader] = set()  # running, including superseded ones
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, len(SaveData.stages))
+        self.load_progress.setMaximumWidth(200)
+        self.load_cancel = QToolButton()
+        self.load_cancel.setIcon(QIcon.fromTheme("process-stop"))
+        self.load_cancel.setToolTip('Cancel loading')
+        self.load_cancel.clicked.connect(self.on_load_cancel_clicked)
+        self.diagnostics = Diagnostics(self)
+        self.diagnostics_button = QToolButton()
+        self.diagnostics_button.setIcon(QIcon.fromTheme("utilities-system-monitor"))
+        self.diagnostics_button.setToolTip('Diagnostics...')
+        self.diagnostics_button.clicked.connect(self.on_diagnostics_clicked)
+        self.statusBar().addPermanentWidget(self.load_progress)
+        self.statusBar().addPermanentWidget(self.load_cancel)
+        self.statusBar().addPermanentWidget(self.diagnostics_button)
+        self.load_progress.hide()
+        self.load_cancel.hide()
+
         self.settings = QSettings("MCondarelli", "DDDAsav")
         file = self.settings.value('file/savefile')
         if file:
             self.dddasav.setText(file)
-            QApplication.processEvents()
-            self.on_dddasav_load()
+            self.on_dddasav_load()  # returns immediately, loading continues in background
 
     def on_main_currentChanged(self, index: int):
         if self.main.currentWidget().objectName() == 'tab_diff':
-            self.diffs.clear()
-            self.diffs.setColumnCount(3)
-            self.diffs.setRowCount(0)
-
-            def callback(line: int, old:str , new:str ):
-                n = self.diffs.rowCount()
-                self.diffs.setRowCount(n + 1)
-                self.diffs.setItem(n, 0, QTableWidgetItem(str(line)))
-                self.diffs.setItem(n, 1, QTableWidgetItem(old))
-                self.diffs.setItem(n, 2, QTableWidgetItem(new))
-
-            self.setCursor(QCursor(Qt.CursorShape.WaitCursor))
-            self.wrapper.compute_diff_table(callback)
-            self.unsetCursor()
+            self.diff_model.select(self.wrapper.diff() if self.wrapper.valid else None)
 
     def on_dddasav_edit(self):
         qfd = QFileDialog()
@@ -90,18 +104,79 @@ class MainWindow(QMainWindow):
             self.on_dddasav_load()
 
     def on_dddasav_load(self):
+        if self.loader is not None:
+            self.loader.cancel()  # superseded, its outcome will be ignored
         self.person.setEnabled(False)
         self.pers.setCurrentIndex(-1)
-        self.setCursor(QCursor(Qt.CursorShape.WaitCursor))
-        try:
-            self.wrapper.from_file(self.dddasav.text())
+        self.main.setEnabled(False)
+        self.actionSavex.setEnabled(False)
+        self.setCursor(QCursor(Qt.CursorShape.BusyCursor))
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.load_cancel.show()
+        self.loader = Loader(self.dddasav.text(), telemetry=self.diagnostics.new_telemetry())
+        self.loader.progress.connect(self.on_loader_progress)
+        self.loader.loaded.connect(self.on_loader_loaded)
+        self.loader.failed.connect(self.on_loader_failed)
+        self.loader.cancelled.connect(self.on_loader_cancelled)
+        self._loaders.add(self.loader)
+        self.loader.start()
+
+    def _loader_done(self) -> bool:
+        """Release the `Loader` which just finished; return True if it is the current one."""
+        loader = self.sender()
+        self._loaders.discard(loader)
+        loader.wait()
+        if loader is not self.loader:
+            return False
+        self.loader = None
+        self.load_progress.hide()
+        self.load_cancel.hide()
+        self.unsetCursor()
+        return True
+
+    @pyqtSlot()
+    def on_diagnostics_clicked(self):
+        self.diagnostics.set_telemetry(self.wrapper.telemetry)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+
+    @pyqtSlot()
+    def on_load_cancel_clicked(self):
+        if self.loader is not None:
+            self.loader.cancel()
+
+    @pyqtSlot(int, str)
+    def on_loader_progress(self, stage: int, name: str):
+        if self.sender() is self.loader:
+            self.load_progress.setValue(stage)
+            self.load_progress.setFormat(f'{name} (%v/%m)')
+
+    @pyqtSlot(object)
+    def on_loader_loaded(self, save: SaveData):
+        if self._loader_done():
+            self.wrapper.adopt(save)
             self.main.setEnabled(True)
             self.actionSavex.setEnabled(True)
-        except ValueError as e:
-            print(f'ERROR: {e}')
-            self.main.setEnabled(False)
-            self.actionSavex.setEnabled(False)
-        self.unsetCursor()
+            self.statusBar().showMessage(f'Loaded in {save.telemetry.summary()}')
+            self.diagnostics.set_telemetry(save.telemetry)
+
+    @pyqtSlot(str)
+    def on_loader_failed(self, error: str):
+        if self._loader_done():
+            log.error('%s', error)
+
+    @pyqtSlot()
+    def on_loader_cancelled(self):
+        if self._loader_done() and self.wrapper.valid:
+            self.main.setEnabled(True)  # keep editing what was loaded before
+            self.actionSavex.setEnabled(True)
+
+    def closeEvent(self, event):
+        for loader in self._loaders:
+            loader.cancel()
+            loader.wait()
+        super().closeEvent(event)
 
     @pyqtSlot()
     def on_savex_triggered(self):
@@ -117,7 +192,8 @@ class MainWindow(QMainWindow):
 
     @pyqtSlot(str)
     def on_pers_currentTextChanged(self, txt):
-        self.person.set_data(self.wrapper.persons[txt])
+        if txt:  # empty while (re)loading
+            self.person.set_data(self.wrapper.persons[txt])
 
     @pyqtSlot(int)
     def on_pers_currentIndexChanged(self, idx):
@@ -131,8 +207,9 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    Log.setup(True if '--debug' in sys.argv[1:] else None)
     app = QApplication(sys.argv)
-    pixmap = QPixmap('resources/dark-arisen.jpg')
+    pixmap = PixmapCache.shared().source('resources/dark-arisen.jpg')
     splash = QSplashScreen(pixmap)
     splash.show()
     app.processEvents()
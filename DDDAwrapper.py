@@ -1,17 +1,17 @@
-import shutil
-import struct
-import zlib
-from collections import namedtuple
-from os import path
-from time import strftime, gmtime
+import contextlib
+import logging
 from typing import Optional
 from xml.etree import ElementTree as ET
 
 from PyQt6.QtCore import QObject, pyqtSignal, pyqtProperty
 
-import Fandom
+import Catalog
+import Diff
+import SaveData as core
+from SaveData import ItemRow, Person, SaveData
+from Telemetry import Telemetry
 
-Header = namedtuple('Header', ['u1', 'rsize', 'csize', 'u2', 'u3', 'u4', 'hash', 'u5'])
+log = logging.getLogger(__name__)
 
 
 class Flag:
@@ -89,14 +89,6 @@ class Jewel(Flag):
     def tag(self):
         return str(self._flag)
 
-def _crc32(buf):
-    crc = 0xffffffff
-    for b in buf:
-        crc ^= b
-        for _ in range(8):
-            crc = (crc >> 1) ^ 0xedb88320 if crc & 1 else crc >> 1
-    return crc
-
 
 class DDDAwrapper(QObject):
     """
@@ -135,66 +127,69 @@ class DDDAwrapper(QObject):
         """
         super().__init__(parent)
         self.persons = None
-        self.original_xml = None
         self.valid: bool = False
-        self.dirty: bool = False
+        self.save: Optional[SaveData] = None
         self.data: Optional[ET.Element] = None
         self._fname: Optional[str] = None
 
-    def from_file(self, fname: str):
-        """
-        Read a `DDDA.sav` savefile from disk.
+    @property
+    def dirty(self) -> bool:
+        return self.save is not None and self.save.dirty
+
+    @property
+    def telemetry(self) -> Optional[Telemetry]:
+        """Timings of the last load (and of the saves since), see `Telemetry`."""
+        return self.save.telemetry if self.save is not None else None
 
+    def from_file(self, fname: str, lazy: bool = True, telemetry: Optional[Telemetry] = None):
+        """
+        Read a `DDDA.sav` savefile from disk, synchronously
+        (see `Loader` to do it in background).
 
+        In `lazy` mode (the default) only the sections handled by `PersonWrapper`
+        are parsed (see `SaveData`).
 
         It may `raise` `ValueError` exception in case file is corrupted.
 
         :param fname: Name of the file to read
+        :param lazy: parse only the sections the editor needs
+        :param telemetry: see `SaveData.load()`
         :return: Nothing
         """
         if self._fname != fname:
             self.valid = False
             self._fname = fname
             if self._fname:
-                with open(self._fname, "rb") as fi:
-                    h = fi.read(32)
-                    hdr = Header(*struct.unpack('<IIIIIIII', h))
-                    buf = fi.read(hdr.csize)
-                crc = _crc32(buf)
-                if crc != hdr.hash:
-                    raise ValueError(f'ERROR: hash mismatch ({crc} != {hdr.hash})')
-                xml = zlib.decompress(buf)
-                xml = xml.decode()
-                self.data = ET.fromstring(xml)
-                if self.data is not None:
-                    self.valid = True
-                    self.dirty = False
-                    self.data_changed.emit()
-                    self.original_xml = xml
-                    self.persons = PersonWrapper.parse(self)
+                self.adopt(SaveData.load(fname, lazy, telemetry=telemetry))
+
+    def adopt(self, save: SaveData):
+        """
+        Make `save` the current content, replacing whatever was there.
+
+        :param save: a fully loaded savefile, e.g. from `Loader`
+        """
+        self.save = save
+        self._fname = save.fname
+        self.data = save.data
+        self.valid = self.data is not None
+        if self.valid:
+            self.data_changed.emit()
+            with save.telemetry.span('persons'):
+                self.persons = PersonWrapper.parse(self)
+
+    def set_value(self, elem: ET.Element, value: str):
+        """Set the `value` attribute of `elem`; all edits go through here so they can be saved incrementally."""
+        self.save.set_value(elem, value)
 
     def _to_xml(self):
-        xml = b'<?xml version="1.0" encoding="utf-8"?>\n' + ET.tostring(self.data).replace(b' />', b'/>')
-        return xml
+        return self.save.to_xml()
 
-    def compute_diff_table(self, callback):
-        xml = self._to_xml().decode()
-        for n, (old, new) in enumerate(zip(self.original_xml.splitlines(), xml.splitlines())):
-            if old != new:
-                callback(n, old, new)
+    def diff(self):
+        """Iterate over the `Diff.Row`s between the file on disk and the current content."""
+        return Diff.hunks(self.save.diff_regions())
 
     def _backup(self, ext=None, fname=None):
-        fname = fname or self._fname
-        p, e = path.splitext(fname)
-        if ext:
-            fname = p + ext
-        if path.isfile(fname):  # create backup if it doesn't exist
-            ts = path.getmtime(fname)
-            p, e = path.splitext(fname)
-            sf = f"{p}-{strftime('%Y%m%d_%H%M%S', gmtime(ts))}{e}"
-            if not path.isfile(sf):
-                shutil.copy2(fname, sf)
-        return fname
+        return core.backup(fname or self._fname, ext)
 
     def to_xml_file(self, fname: str = None):
         fname = self._backup('.xml', fname)
@@ -204,45 +199,36 @@ class DDDAwrapper(QObject):
             fo.write(b'\n')
 
     def to_file(self, fname=None):
-        fname = self._backup(fname=fname)
-        sss = self._to_xml()  # et.tostring(self.data).replace(b' />', b'/>')
-        rsize = len(sss)
-        z = zlib.compress(sss)
-        crc = _crc32(z)
-        hdr = Header(21, rsize, len(z), 860693325, 0, 860700740, crc, 1079398965)
-        h = struct.pack('<IIIIIIII', *hdr)
-
-        with open(fname, 'wb') as fo:
-            fo.write(h)
-            fo.write(z)
-            fo.write(b'\0' * (524288 - len(h) - len(z)))
+        self.save.to_file(self._backup(fname=fname))
 
     def person(self, name):
         return self.persons[name]
 
 
 class ItemWrapper(QObject):
-    def __init__(self, xclass: ET.Element, parent):
+    def __init__(self, row: ItemRow, parent):
         super().__init__(parent)
-        self.xclass = xclass
+        self.xclass = row.xclass
+        self.wrapper = parent.wrapper
+        self.row = row
         self.equipped = isinstance(parent, EquipmentWrapper)
         self._idx = None
         self._type = None
 
     def _is_valid(self):
-        return int(self.xclass.find('./s16[@name="data.mNum"]').get('value')) > 0
+        return self.row.valid
 
     def _get_idx(self):
         if self._idx is None:
             if self._is_valid():
-                self._idx = int(self.xclass.find('./s16[@name="data.mItemNo"]').get('value'))
+                self._idx = self.row.item
         return self._idx
 
     def _get_type(self):
         if self._type is None:
             idx = self._get_idx()
             if idx is not None:
-                self._type = Fandom.all_by_id[self.idx]['Type']
+                self._type = Catalog.all_by_id[self.idx]['Type']
         return self._type
 
     def is_armor(self):
@@ -294,7 +280,7 @@ class ItemWrapper(QObject):
     @property
     def flag(self) -> Flag:
         if self._is_valid():
-            value = int(self.xclass.find('./u32[@name="data.mFlag"]').get('value'))
+            value = self.row.flag
             if self.is_equipment():
                 return Tier(value)
             elif self.is_jewel():
@@ -304,7 +290,7 @@ class ItemWrapper(QObject):
     @flag.setter
     def flag(self, tier: Flag):
         if tier is not None:
-            self.xclass.find('./u32[@name="data.mFlag"]').set('value', str(tier.idx()))
+            self.row.set('data.mFlag', tier.idx())
 
     @property
     def flag_name(self):
@@ -330,13 +316,13 @@ class EquipmentWrapper(QObject):
         'Jewelry 2',
     ]
 
-    def __init__(self, xarray: ET.Element, parent):
+    def __init__(self, rows: list[ItemRow], parent):
         super().__init__(parent)
-        self.xarray = xarray
-        self.carray = self.xarray.findall('.//class[@type="sItemManager::cITEM_PARAM_DATA"]')
-        if len(self.carray) != 12:
-            print(f'Warning: {len(self.carray)} found (expected 12)')
-        self.slots = {slot: ItemWrapper(xclass, self) for slot, xclass in zip(self._slots, self.carray)}
+        self.wrapper = parent.wrapper
+        self.rows = rows
+        if len(self.rows) != 12:
+            log.warning('%d equipment slots found (expected 12)', len(self.rows))
+        self.slots = {slot: ItemWrapper(row, self) for slot, row in zip(self._slots, self.rows)}
 
     def __getitem__(self, item):
         if isinstance(item, str):
@@ -353,8 +339,7 @@ class EquipmentWrapper(QObject):
     def dump(self):
         for name, data in self.slots.items():
             if data.idx >= 0:
-                print(f'    {name:>20s} : {Fandom.all_by_id[data.idx]["Name"]:>25s} : {data.flag}')
-        print(f'------------------------------------------------------------------------------------')
+                log.debug('    %20s : %25s : %s', name, Catalog.all_by_id[data.idx]['Name'], data.flag)
 
 
 class PersonWrapper(QObject):
@@ -365,8 +350,9 @@ class PersonWrapper(QObject):
     vocl_changed = pyqtSignal(int)
     stor_changed = pyqtSignal()
     rowchanged = pyqtSignal(int)
+    rowschanged = pyqtSignal(int, int)  # first, last
 
-    _persons = ['Player', 'Main Pawn', 'Pawn A', 'Pawn B', 'Storage']
+    _persons = Person.persons
 
     @staticmethod
     def parse(wrapper: DDDAwrapper):
@@ -376,110 +362,57 @@ class PersonWrapper(QObject):
         super().__init__(wrapper)
         self.wrapper = wrapper
         self.data = wrapper.data
-        self._who = who
+        self.core = wrapper.save.person(who)
         self._equipment: Optional[EquipmentWrapper] = None
+        if self.core.equipment is not None:
+            self._equipment = EquipmentWrapper(self.core.equipment, self)
 
-        stores = self.data.findall('.//array[@name="mItem"]/class[@type="cSAVE_DATA_ITEM"]')
-
-        pdata = None
-        for n, person in enumerate(self._persons):
-            if who == person:
-                self._index = n
-                match self._index:
-                    case 0:
-                        pdata = self.data.find(".//class[@name='mPl']")
-                        self._store = stores[0].findall('./array/class[@type="sItemManager::cITEM_PARAM_DATA"]')
-                        self._count = stores[0].find('./u32[@name="mItemCount"]')
-                    case 1:
-                        pdata = self.data.find(".//class[@type='cSAVE_DATA_CMC']/..[@name='mCmc']")[0]
-                        self._store = stores[1].findall('./array/class[@type="sItemManager::cITEM_PARAM_DATA"]')
-                        self._count = stores[1].find('./u32[@name="mItemCount"]')
-                    case 2:
-                        pdata = self.data.find(".//class[@type='cSAVE_DATA_CMC']/..[@name='mCmc']")[1]
-                        self._store = stores[2].findall('./array/class[@type="sItemManager::cITEM_PARAM_DATA"]')
-                        self._count = stores[2].find('./u32[@name="mItemCount"]')
-                    case 3:
-                        pdata = self.data.find(".//class[@type='cSAVE_DATA_CMC']/..[@name='mCmc']")[2]
-                        self._store = stores[3].findall('./array/class[@type="sItemManager::cITEM_PARAM_DATA"]')
-                        self._count = stores[3].find('./u32[@name="mItemCount"]')
-                    case 4:
-                        self._store = self.data.findall(
-                            './/array[@name="mStorageItem"]/class[@type="sItemManager::cITEM_PARAM_DATA"]')
-                        self._count = self.data.find('.//u32[@name="mStorageItemCount"]')
-                    case _:
-                        raise ValueError(f'Unknown person "{who}"')
-                break
-        if pdata is not None:
-            self._equipment = EquipmentWrapper(pdata.find('.//array[@name="mEquipItem"]'), self)
-            self._name = pdata.findall('.//array[@name="(u8*)mNameStr"]/u8')
-            self._level = pdata.find(".//u8[@name='mLevel']")
-            self._voc = pdata.find(".//u8[@name='mJob']")
-            self._vlevels = pdata.findall(".//array[@name='mJobLevel']/u8")
-        else:
-            self._name = None
-            self._level = None
-            self._voc = None
-            self._vlevels = None
-
-        self.dump()
+        if log.isEnabledFor(logging.DEBUG):
+            self.dump()
 
     def dump(self):
-        print(f'===== {self._who}: {self.name} =======================================================')
+        """Log equipment and inventory content at DEBUG level."""
+        log.debug('===== %s: %s =====', self.core.who, self.name)
         if self._equipment is not None:
             self._equipment.dump()
-        for row in self._store:
+        for row in self.core.rows:
             if self.row_valid(row):
-                print(f'    {self.row_item(row):04d} : {Fandom.all_by_id[self.row_item(row)]["Name"]:>25s} : {self.row_flag(row)}')
-        print(f'------------------------------------------------------------------------------------')
-        print()
+                log.debug('    %04d : %25s : %s', row.item, Catalog.all_by_id[row.item]['Name'], row.flag)
 
     @pyqtProperty(str)
     def person(self):
-        if self._name is not None:
-            return self._persons[self._index]
+        if self.core.equipment is not None:
+            return self.core.who
         else:
             return None
 
     @pyqtProperty(str)
     def name(self) -> str:
-        name = '???'
-        if self._name is not None:
-            name = ''
-            for chx in self._name:
-                chi = int(chx.get('value'))
-                if chi > 0:
-                    name += chr(chi)
-        return name
+        return self.core.name
 
     @pyqtProperty(int)
     def level(self):
-        return int(self._level.get('value')) if self._level is not None else -1
+        return self.core.level
 
     @level.setter
     def level(self, value: int):
-        # TODO: check value is in range [1..200]
-        if self._level is not None:
-            self._level.set('value', str(value))
+        self.core.level = value
 
     @pyqtProperty(int)
     def vocation(self):
-        return int(self._voc.get('value')) if self._voc is not None else -1
+        return self.core.vocation
 
     @vocation.setter
     def vocation(self, value: int):
-        # TODO: check value is in range [0..8]
-        if self._voc is not None:
-            self._voc.set('value', str(value))
+        self.core.vocation = value
 
     @pyqtProperty(int)
     def vocation_level(self):
-        return int(self._vlevels[self.vocation - 1].get('value')) if self._level is not None else -1
+        return self.core.vocation_level
 
     @vocation_level.setter
     def vocation_level(self, value: int):
-        # TODO: check value is in range [1..9]
-        if self._vlevels is not None:
-            self._vlevels[self.vocation - 1].set('value', str(value))
+        self.core.vocation_level = value
 
     @pyqtProperty(EquipmentWrapper)
     def equipment(self):
@@ -487,79 +420,70 @@ class PersonWrapper(QObject):
 
     @pyqtProperty(int)
     def rows(self):
-        return self._store
+        return self.core.rows
 
     @staticmethod
-    def row_num(row):
-        return int(row.find('./s16[@name="data.mNum"]').get('value'))
+    def row_num(row: ItemRow):
+        return row.num
 
     @staticmethod
-    def row_valid(row):
-        return PersonWrapper.row_num(row) > 0
+    def row_valid(row: ItemRow):
+        return row.num > 0
 
     @staticmethod
-    def row_item(row):
-        return int(row.find('./s16[@name="data.mItemNo"]').get('value'))
+    def row_item(row: ItemRow):
+        return row.item
 
     @staticmethod
-    def row_flag(row):
-        return int(row.find('./u32[@name="data.mFlag"]').get('value'))
+    def row_flag(row: ItemRow):
+        return row.flag
 
-    @staticmethod
-    def row_set_flag(row, value: int):
-        row.find('./u32[@name="data.mFlag"]').set('value', str(value))
+    def row_set_flag(self, row: ItemRow, value: int):
+        self.core.row_set_flag(row, value)
 
     @staticmethod
-    def row_owner(row):
-        return int(row.find('./s8[@name="data.mOwnerId"]').get('value'))
+    def row_owner(row: ItemRow):
+        return row.owner
 
-    def row_inc(self, row, inc):
-        idx = self._store.index(row)
-        if idx < 0:
-            print(f'ERROR: row not found ({row})')
+    @contextlib.contextmanager
+    def bulk(self):
+        """
+        Group edits in a transaction (see `Person.batch()`).
+
+        Per row notifications are held back until the block ends, then a single
+        `rowschanged` covering every edited row is emitted (also when the block
+        raises and the edits are rolled back).
+        """
+        if self.core.batch_active:
+            with self.core.batch() as touched:
+                yield touched
             return
-        num = self.row_num(row)
-        n = num + inc
-        if n > 0:
-            row.find('./s16[@name="data.mNum"]').set('value', str(n))
-        else:
-            row.find('./s16[@name="data.mNum"]').set('value', "0")
-            row.find('./s16[@name="data.mItemNo"]').set('value', "-1")
-            row.find('./u32[@name="data.mFlag"]').set('value', "0")
-            row.find('./u16[@name="data.mChgNum"]').set('value', "0")
-            row.find('./u16[@name="data.mDay1"]').set('value', "0")
-            row.find('./u16[@name="data.mDay2"]').set('value', "0")
-            row.find('./u16[@name="data.mDay3"]').set('value', "0")
-            row.find('./s8[@name="data.mMutationPool"]').set('value', "0")
-            row.find('./s8[@name="data.mOwnerId"]').set('value', "0")  # str(self._index))
-            row.find('./u32[@name="data.mKey"]').set('value', "0")
-            n = 0
-        self.tot_inc(n - num)
-        self.rowchanged.emit(idx)
-
-    def add(self, idx):
-        # FIXME: should check if similar row exists
-        item = Fandom.all_by_id[idx]
-        for n, row in enumerate(self._store):
-            if self.row_num(row) == 0:
-                row.find('./s16[@name="data.mNum"]').set('value', "1")
-                row.find('./s16[@name="data.mItemNo"]').set('value', str(item['ID']))
-                row.find('./u32[@name="data.mFlag"]').set('value', "1")
-                row.find('./u16[@name="data.mChgNum"]').set('value', "0")
-                row.find('./u16[@name="data.mDay1"]').set('value', "0")
-                row.find('./u16[@name="data.mDay2"]').set('value', "0")
-                row.find('./u16[@name="data.mDay3"]').set('value', "0")
-                row.find('./s8[@name="data.mMutationPool"]').set('value', "0")
-                row.find('./s8[@name="data.mOwnerId"]').set('value', "0")  # str(self._index)) != "0" for EQUIPPED items
-                row.find('./u32[@name="data.mKey"]').set('value', "0")
-                self.tot_inc(1)
-                self.rowchanged.emit(n)  # FIXME: this removes selection
-                break
+        touched = set()
+        try:
+            with self.core.batch() as touched:
+                yield touched
+        finally:
+            if touched:
+                self.rowschanged.emit(min(touched), max(touched))
+
+    def _rowchanged(self, n: int):
+        if not self.core.batch_active:
+            self.rowchanged.emit(n)
+
+    def row_inc(self, row: ItemRow, inc):
+        self._rowchanged(self.core.row_inc(row, inc))
+
+    def add(self, idx, num=1):
+        if (n := self.core.add(idx, num)) >= 0:
+            self._rowchanged(n)
+
+    def add_many(self, items) -> list[int]:
+        """Add many items at once (see `Person.add_many()`), notifying views once."""
+        with self.bulk():
+            return self.core.add_many(items)
 
     def tot_inc(self, inc):
-        if self._count is not None:
-            count = int(self._count.get('value')) + inc
-            self._count.set('value', str(count))
+        self.core.tot_inc(inc)
 
 
 if __name__ == '__main__':
@@ -571,7 +495,7 @@ if __name__ == '__main__':
     for row in player.rows:
         if player.row_valid(row):
             item = player.row_item(row)
-            print(item, Fandom.all_by_id[item]['Name'],
+            print(item, Catalog.all_by_id[item]['Name'],
                   player.row_num(row),
                   player.row_owner(row),
                   player.row_flag(row))
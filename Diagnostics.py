@@ -0,0 +1,34 @@
+from typing import Optional
+
+from PyQt6.QtGui import QFontDatabase
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QPlainTextEdit, QCheckBox, QDialogButtonBox
+
+from Telemetry import Telemetry
+
+
+class Diagnostics(QDialog):
+    """Show the `Telemetry` of the last load and choose the profilers to run on the next one."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Diagnostics')
+        self.report = QPlainTextEdit()
+        self.report.setReadOnly(True)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.report.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.profile = QCheckBox('Profile next load (cProfile)')
+        self.trace = QCheckBox('Trace allocations on next load (tracemalloc)')
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.report)
+        layout.addWidget(self.profile)
+        layout.addWidget(self.trace)
+        layout.addWidget(buttons)
+        self.resize(800, 500)
+
+    def new_telemetry(self) -> Telemetry:
+        """A `Telemetry` for the next load, with the profilers currently selected."""
+        return Telemetry(profile=self.profile.isChecked(), trace=self.trace.isChecked())
+
+    def set_telemetry(self, telemetry: Optional[Telemetry]):
+        self.report.setPlainText(telemetry.format() if telemetry is not None else 'Nothing loaded yet')
@@ -0,0 +1,125 @@
+"""
+Line diff for the Diff tab.
+
+`myers()` computes a shortest edit script (E. Myers, "An O(ND) Difference
+Algorithm and Its Variations", 1986); `hunks()` runs it over the regions a
+`SaveData` reports as touched by edits and yields table rows, grouped in
+hunks, so the cost depends on the size of the edits, not of the savefile.
+"""
+from collections import namedtuple
+from itertools import zip_longest
+
+Row = namedtuple('Row', ['old_no', 'old', 'new_no', 'new'])
+"""A diff table row; hunk headers have no line numbers and the `@@ ... @@` text in `old`."""
+
+
+def myers(a: list, b: list) -> list[tuple[str, int, int, int, int]]:
+    """
+    Return the shortest edit script turning `a` into `b`.
+
+    Opcodes have the same form as `difflib.SequenceMatcher.get_opcodes()`:
+    (tag, i1, i2, j1, j2) with tag one of 'equal', 'replace', 'delete', 'insert'.
+    """
+    n, m = len(a), len(b)
+    offset = n + m + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(n + m + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])  # only diagonals -d-1..d+1 are read back
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]  # step down: insertion
+            else:
+                x = v[offset + k - 1] + 1  # step right: deletion
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _opcodes(_backtrack(trace, n, m))
+    raise AssertionError('unreachable')
+
+
+def _backtrack(trace: list, x: int, y: int) -> list[tuple[str, int, int]]:
+    moves = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[d + k] < v[d + k + 2]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[d + 1 + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            moves.append(('equal', x, y))
+        if d > 0:
+            moves.append(('insert' if x == prev_x else 'delete', prev_x, prev_y))
+        x, y = prev_x, prev_y
+    moves.reverse()
+    return moves
+
+
+def _opcodes(moves: list[tuple[str, int, int]]) -> list[tuple[str, int, int, int, int]]:
+    opcodes = []
+    i = j = 0
+    for move, x, y in moves:
+        if move == 'equal':
+            if opcodes and opcodes[-1][0] == 'equal':
+                opcodes[-1] = ('equal', opcodes[-1][1], x + 1, opcodes[-1][3], y + 1)
+            else:
+                opcodes.append(('equal', x, x + 1, y, y + 1))
+            i, j = x + 1, y + 1
+            continue
+        if move == 'delete':
+            i = x + 1
+        else:
+            j = y + 1
+        if opcodes and opcodes[-1][0] != 'equal':
+            _, i1, _, j1, _ = opcodes[-1]
+            opcodes[-1] = (None, i1, i, j1, j)
+        else:
+            opcodes.append((None, x, i, y, j))
+    return [(tag or ('replace' if i1 < i2 and j1 < j2 else 'delete' if i1 < i2 else 'insert'), i1, i2, j1, j2)
+            for tag, i1, i2, j1, j2 in opcodes]
+
+
+def hunks(regions):
+    """
+    Yield the `Row`s of the diff of the given regions, one hunk per run of changed lines.
+
+    :param regions: (old start, old lines, new start, new lines) tuples, in
+        document order, with 1-based line numbers
+    """
+    for old_start, old, new_start, new in regions:
+        for tag, i1, i2, j1, j2 in myers(old, new):
+            if tag == 'equal':
+                continue
+            yield Row(None, f'@@ -{old_start + i1},{i2 - i1} +{new_start + j1},{j2 - j1} @@', None, None)
+            for i, j in zip_longest(range(i1, i2), range(j1, j2)):
+                yield Row(None if i is None else old_start + i, None if i is None else old[i],
+                          None if j is None else new_start + j, None if j is None else new[j])
+
+
+if __name__ == '__main__':
+    # self check against a brute force LCS on random sequences
+    import random
+
+    def lcs(a, b):
+        t = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i, x in enumerate(a):
+            for j, y in enumerate(b):
+                t[i + 1][j + 1] = t[i][j] + 1 if x == y else max(t[i][j + 1], t[i + 1][j])
+        return t[-1][-1]
+
+    for _ in range(2000):
+        a = random.choices('abc', k=random.randrange(12))
+        b = random.choices('abc', k=random.randrange(12))
+        ops = myers(a, b)
+        assert [x for tag, i1, i2, j1, j2 in ops for x in b[j1:j2]] == b, (a, b, ops)
+        assert all(a[i1:i2] == b[j1:j2] for tag, i1, i2, j1, j2 in ops if tag == 'equal'), (a, b, ops)
+        assert sum(i2 - i1 for tag, i1, i2, j1, j2 in ops if tag == 'equal') == lcs(a, b), (a, b, ops)
+    print('ok')
@@ -0,0 +1,72 @@
+from itertools import islice
+
+from PyQt6.QtCore import Qt, QModelIndex
+from PyQt6.QtGui import QFont
+from PyQt6.QtWidgets import QHeaderView
+
+from AbstractModel import AbstractModel
+from Diff import Row
+
+
+class DiffModel(AbstractModel):
+    """
+    Diff tab model.
+
+    Rows are pulled from the `Diff.hunks()` generator in batches, as the view
+    asks for them (`canFetchMore()`/`fetchMore()`), and only rendered by `data()`,
+    so opening the tab costs the same for one edit or for thousands.
+    """
+    batch = 256
+
+    def __init__(self):
+        super().__init__([
+            AbstractModel.Column('Line', self.get_line),
+            AbstractModel.Column('Original', self.get_old, hint=QHeaderView.ResizeMode.Stretch,
+                                 align=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
+            AbstractModel.Column('Current', self.get_new, hint=QHeaderView.ResizeMode.Stretch,
+                                 align=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
+        ])
+        self._pending = None
+        self._header_font = QFont()
+        self._header_font.setBold(True)
+
+    def select(self, rows=None):
+        self.beginResetModel()
+        self._rows = []
+        self._pending = iter(rows) if rows is not None else None
+        self.endResetModel()
+
+    def canFetchMore(self, parent=...):
+        return self._pending is not None
+
+    def fetchMore(self, parent=...):
+        rows = list(islice(self._pending, self.batch))
+        if len(rows) < self.batch:
+            self._pending = None
+        if rows:
+            n = len(self._rows)
+            self.beginInsertRows(QModelIndex(), n, n + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def data(self, index, role=...):
+        if role == Qt.ItemDataRole.FontRole and self._is_header(self._rows[index.row()]):
+            return self._header_font
+        return super().data(index, role)
+
+    @staticmethod
+    def _is_header(x: Row):
+        return x.old_no is None and x.new_no is None
+
+    def get_line(self, x: Row):
+        if x.old_no is not None:
+            return str(x.old_no)
+        if x.new_no is not None:
+            return f'+{x.new_no}'
+        return ''
+
+    def get_old(self, x: Row):
+        return x.old
+
+    def get_new(self, x: Row):
+        return x.new
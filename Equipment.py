@@ -1,3 +1,4 @@
+import logging
 from os import path
 from typing import Optional
 
@@ -6,10 +7,12 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QWidget, QComboBox, QDialog, QDialogButtonBox, QVBoxLayout, QLabel, QCheckBox
 
 from DDDAwrapper import Tier, PersonWrapper
-import Fandom
+import Catalog
 import ItemModel
 import Vocations
 
+log = logging.getLogger(__name__)
+
 
 class EquipmentCombo(QComboBox):
     map_type = {
@@ -33,9 +36,8 @@ class EquipmentCombo(QComboBox):
 
     def set_model(self, typ):
         self._slot = typ
-        m = ItemModel.ItemModel()
-        p = ItemModel.ItemProxy()
-        p.setSourceModel(m)
+        p = ItemModel.ItemProxy(self)
+        p.setSourceModel(ItemModel.ItemModel.shared())
         p.set_type(self.map_type[self._slot])
         self.setModel(p)
         self.setModelColumn(1)
@@ -49,11 +51,11 @@ class EquipmentCombo(QComboBox):
         slot = self._person_wrapper.equipment[tag]
         what = slot.idx
         if what < 0:
-            print(f'{tag}: UNEQUIPPED ({what})')
+            log.debug('%s: UNEQUIPPED (%d)', tag, what)
             self.setCurrentIndex(-1)
         else:
-            name = Fandom.all_by_id[what]['Name']
-            print(f'{tag}: {name} ({what})')
+            name = Catalog.all_by_id[what]['Name']
+            log.debug('%s: %s (%d)', tag, name, what)
             self.setCurrentText(name)
 
     def show_menu(self, wid, pos):
@@ -97,8 +99,8 @@ class EquipmentCombo(QComboBox):
                 super().accept()
                 
         item_name = wid.currentText()
-        item = Fandom.all_by_name[item_name]
-        if Fandom.is_equipment(item_name):
+        item = Catalog.all_by_name[item_name]
+        if Catalog.is_equipment(item_name):
             dialog = Dialog(item, self)
             dialog.exec()
 
@@ -107,19 +109,6 @@ class Equipment(QWidget):
     def __init__(self, parent=None):
         self.person_wrapper: Optional[PersonWrapper] = None
 
-        def setmodel(wid, typ):
-            m = ItemModel.ItemModel()
-            p = ItemModel.ItemProxy()
-            p.setSourceModel(m)
-            p.set_type(typ)
-            self.vocation.currentTextChanged.connect(p.set_vocation)
-            wid.setModel(p)
-            wid.setModelColumn(1)
-            wid.setCurrentIndex(-1)
-            # wid.currentTextChanged.connect(lambda s: print(f'Equipment({typ}): Changed to "{s}"'))
-            wid.customContextMenuRequested.connect(lambda pos: self.show_menu(wid, pos))
-            wid.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-
         super().__init__(parent)
         self.head: Optional[EquipmentCombo] = None
         self.torso: Optional[EquipmentCombo] = None
@@ -164,11 +153,11 @@ class Equipment(QWidget):
             slot = self.person_wrapper.equipment[tag]
             what = slot.idx
             if what < 0:
-                print(f'{tag}: UNEQUIPPED ({what})')
+                log.debug('%s: UNEQUIPPED (%d)', tag, what)
                 where.setCurrentIndex(-1)
             else:
-                name = Fandom.all_by_id[what]['Name']
-                print(f'{tag}: {name} ({what})')
+                name = Catalog.all_by_id[what]['Name']
+                log.debug('%s: %s (%d)', tag, name, what)
                 where.setCurrentText(name)
 
         self.primary.set_equipment(self.person_wrapper, 'Primary Weapon')
@@ -203,8 +192,8 @@ class Equipment(QWidget):
                 self.setLayout(self.layout)
 
         item_name = wid.currentText()
-        item = Fandom.all_by_name[item_name]
-        if Fandom.is_equipment(item_name):
+        item = Catalog.all_by_name[item_name]
+        if Catalog.is_equipment(item_name):
             dialog = Dialog(item, self)
             dialog.exec()
 
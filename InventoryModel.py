@@ -1,33 +1,53 @@
+import logging
+from typing import Optional
+
 from PyQt6.QtCore import Qt, pyqtSlot, QSortFilterProxyModel, QModelIndex
 
-import Fandom
+import Catalog
 from AbstractModel import AbstractModel
-from DDDAwrapper import Tier, PersonWrapper as PW
-from Fandom import all_by_id
+from DDDAwrapper import Tier, ItemRow
+from Catalog import all_by_id
+from Thumbnails import Thumbnails, ICON_SIZE
+
+log = logging.getLogger(__name__)
 
 
 class InventoryModel(AbstractModel):
     def __init__(self):
         super().__init__([
-            AbstractModel.Column('ID', self.get_id),
+            AbstractModel.Column('ID', self.get_id, sort=lambda x: x.item),
             AbstractModel.Column('Item', self.get_item,
-                                 align=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
+                                 align=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                                 icon=lambda x: Thumbnails.shared().item(all_by_id[x.item], ICON_SIZE)),
             AbstractModel.Column('Type', self.get_type,
                                  align=Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
-            AbstractModel.Column('Count', self.get_count),
+            AbstractModel.Column('Count', self.get_count, sort=lambda x: x.num),
             AbstractModel.Column('Flag', self.get_flag,
                                  align=Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter),
+            AbstractModel.Column('Weight', self.get_weight, sort=self.weight),
         ])
         self._inventory = None
+        self._by_image: Optional[dict[str, list[int]]] = None  # image -> rows showing it, `None` if stale
 
     def select(self, what=None):
+        """Show the rows of `what`; `None` detaches the model from its inventory (and the thumbnails)."""
         if self._inventory:
             self._inventory.changed.disconnect(self.changed)
             self._inventory.rowchanged.disconnect(self.rowchanged)
+            self._inventory.rowschanged.disconnect(self.rowschanged)
+            Thumbnails.shared().ready.disconnect(self._on_thumbnail)
 
         self._inventory = what
+        if what is None:
+            self.beginResetModel()
+            self._rows = []
+            self._by_image = None
+            self.endResetModel()
+            return
         self._inventory.changed.connect(self.changed)
         self._inventory.rowchanged.connect(self.rowchanged)
+        self._inventory.rowschanged.connect(self.rowschanged)
+        Thumbnails.shared().ready.connect(self._on_thumbnail)
         self.changed()
 
     def setData(self, index, value, role = ...):
@@ -36,17 +56,17 @@ class InventoryModel(AbstractModel):
             if func := self._columns[column] is not None:
                 func(index, value)
 
-    def get_id(self, x):
-        return str(PW.row_item(x))
+    def get_id(self, x: ItemRow):
+        return str(x.item)
 
-    def get_item(self, x):
-        return all_by_id[PW.row_item(x)]['Name']
+    def get_item(self, x: ItemRow):
+        return all_by_id[x.item]['Name']
 
-    def get_type(self, x):
-        return all_by_id[PW.row_item(x)]['Type']
+    def get_type(self, x: ItemRow):
+        return all_by_id[x.item]['Type']
 
-    def is_armor(self, x):
-        item = PW.row_item(x)
+    def is_armor(self, x: ItemRow):
+        item = x.item
         item_type = all_by_id[item]['Type']
         return item_type in [
             'Arms Armor',
@@ -58,8 +78,8 @@ class InventoryModel(AbstractModel):
             'Torso Armor',
         ]
 
-    def is_weapon(self, x):
-        item = PW.row_item(x)
+    def is_weapon(self, x: ItemRow):
+        item = x.item
         item_type = all_by_id[item]['Type']
         return item_type in [
             'Archistaves',
@@ -81,14 +101,13 @@ class InventoryModel(AbstractModel):
             x = self._inventory.rows[x.row()]
         return self.is_armor(x) or self.is_weapon(x)
 
-    def get_flag(self, x):
-        level = PW.row_flag(x)
+    def get_flag(self, x: ItemRow):
+        level = x.flag
         if self.is_equipment(x):
             try:
                 return Tier(level).tag()
             except KeyError:
-                print(f'Warning: unknown Tier id {level} ({level:04x})')
-                pass
+                log.warning('unknown Tier id %d (%04x)', level, level)
         return level
 
     def set_flag(self, x, value):
@@ -96,32 +115,67 @@ class InventoryModel(AbstractModel):
             x = self._inventory.rows[x.row()]
         if isinstance(value, str):
             value = Tier(value).idx()
-        PW.row_set_flag(x, value)
+        self._inventory.row_set_flag(x, value)
+
+    def get_count(self, x: ItemRow):
+        return str(x.num)
+
+    @staticmethod
+    def weight(x: ItemRow) -> float:
+        """Weight of the whole stack, -1 if unknown."""
+        if x.num <= 0 or (weight := Catalog.number(x.item, 'weight')) is None:
+            return -1
+        return x.num * weight
 
-    def get_count(self, x):
-        return str(PW.row_num(x))
+    def get_weight(self, x: ItemRow):
+        weight = self.weight(x)
+        return f'{weight:.2f}' if weight >= 0 else ''
 
     @pyqtSlot()
     def changed(self):
         self.beginResetModel()
         self._rows = self._inventory.rows
+        self._by_image = None
         self.endResetModel()
 
+    def _on_thumbnail(self, fname: str, size: int):
+        if self._by_image is None:
+            self._by_image = {}
+            for n, x in enumerate(self._rows):
+                if x.valid and (entry := all_by_id.get(x.item)) is not None:
+                    for image in (entry['img'], entry.get('sheet')):
+                        if image:
+                            self._by_image.setdefault(image, []).append(n)
+        for n in self._by_image.get(fname, ()):
+            index = self.index(n, 1)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
     @pyqtSlot(int)
     def rowchanged(self, index):
+        self._by_image = None
         self.dataChanged.emit(
             self.index(index, 0), self.index(index, len(self._columns) - 1))
 
+    @pyqtSlot(int, int)
+    def rowschanged(self, first, last):
+        self._by_image = None
+        self.dataChanged.emit(
+            self.index(first, 0), self.index(last, len(self._columns) - 1))
+
     def get_tooltip(self, index: QModelIndex):
         x = self._inventory.rows[index.row()]
-        idx = PW.row_item(x)
-        return Fandom.all_by_id[idx]['desc']
+        idx = x.item
+        return Catalog.all_by_id[idx]['desc']
 
 
 class InventoryProxy(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(AbstractModel.SortRole)
+
     def filterAcceptsRow(self, source_row, source_parent):
         row = self.sourceModel().row(source_row)
-        return PW.row_valid(row)
+        return row.num > 0
 
 
 if __name__ == '__main__':
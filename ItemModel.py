@@ -1,11 +1,32 @@
+from typing import Optional
+
 from PyQt6.QtCore import Qt, QSortFilterProxyModel, QModelIndex
 from PyQt6.QtWidgets import QHeaderView
 
-import Fandom
+import Catalog
 from AbstractModel import AbstractModel
+from SearchIndex import SearchIndex
+from Thumbnails import Thumbnails, ICON_SIZE
 
 
 class ItemModel(AbstractModel):
+    """
+    The whole item catalog as a table.
+
+    A single instance is meant to be shared (see `shared()`) by all the views
+    needing the catalog; they filter it through their own `ItemProxy`, which
+    intersects the precomputed row bitsets (see `Catalog.bitset()`) of
+    `type_rows()`, `usable_rows()` and `search()`.
+    """
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """Process-wide catalog model."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
     def __init__(self):
         self.what = 'ALL'
         super().__init__([
@@ -14,18 +35,73 @@ class ItemModel(AbstractModel):
                                  Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter),
             AbstractModel.Column('Name', lambda x: x['Name'],
                                  QHeaderView.ResizeMode.ResizeToContents,
-                                 Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
+                                 Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                                 icon=lambda x: Thumbnails.shared().item(x, ICON_SIZE)),
+            AbstractModel.Column('Weight', self.get_weight, sort=lambda x: self._number(x, 'weight')),
+            AbstractModel.Column('Value', self.get_value, sort=lambda x: self._number(x, 'sell_value')),
             AbstractModel.Column('Description', lambda x: x['desc'],
                                  QHeaderView.ResizeMode.ResizeToContents,
                                  Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter),
         ])
+        self._all_rows = 0
+        self._by_type: dict[str, int] = {}
+        self._by_usable: dict[int, int] = {}
+        self._index: Optional[SearchIndex] = None
+        self._by_image: dict[str, list[int]] = {}
+        Thumbnails.shared().ready.connect(self._on_thumbnail)
         self.select()
 
     def select(self):
         self.beginResetModel()
-        self._rows = [x for x in Fandom.all_by_name.values()]
+        cat = Catalog.catalog()
+        # catalog row of each of our rows: documented items only, game-only ones cannot be added
+        positions = [n for n in cat.by_name.values() if cat.sources(n) & Catalog.FROM_FANDOM]
+        self._rows = [cat.entry(n) for n in positions]
+        self._all_rows = (1 << len(self._rows)) - 1
+        types = {}
+        for n, pos in enumerate(positions):
+            types.setdefault(cat.type(pos), []).append(n)
+        self._by_type = {k: Catalog.bitset(v) for k, v in types.items()}
+        usable = [Catalog.column('usable')[pos] for pos in positions]
+        self._by_usable = {}
+        for name in Catalog.vocations + Catalog.sexes:
+            bit = Catalog.usable_bit(name)
+            self._by_usable[bit] = Catalog.bitset(n for n, x in enumerate(usable) if x & bit)
+        self._index = None
+        self._by_image = {}
+        for n, row in enumerate(self._rows):
+            for fname in (row['img'], row.get('sheet')):
+                if fname:
+                    self._by_image.setdefault(fname, []).append(n)
         self.endResetModel()
 
+    def _on_thumbnail(self, fname: str, size: int):
+        for n in self._by_image.get(fname, ()):
+            index = self.index(n, 1)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def type_rows(self, typ: str) -> int:
+        """Bitset of the rows of items of type `typ` ('ALL' for every row)."""
+        if typ == 'ALL':
+            return self._all_rows
+        return self._by_type.get(typ, 0)
+
+    def usable_rows(self, vocation: str = '', sex: str = '') -> int:
+        """Bitset of the rows of items usable by `vocation` and `sex` ('' for anyone)."""
+        rows = self._all_rows
+        for x in (vocation, sex):
+            if x:
+                rows &= self._by_usable[Catalog.usable_bit(x)]
+        return rows
+
+    def search(self, query: str) -> int:
+        """Bitset of the rows whose name matches `query` (see `SearchIndex.search()`)."""
+        if not query:
+            return self._all_rows
+        if self._index is None:
+            self._index = SearchIndex([x['Name'] for x in self._rows])
+        return Catalog.bitset(self._index.search(query))
+
     def id(self, idx: int):
         return self._rows[idx]['ID']
 
@@ -38,6 +114,22 @@ class ItemModel(AbstractModel):
     def value(self, idx: int):
         return self._rows[idx]
 
+    @staticmethod
+    def _number(x: dict, column: str):
+        """Numeric catalog value, -1 if unknown so that those sort first."""
+        value = Catalog.number(x['Name'], column)
+        return value if value is not None else -1
+
+    def get_weight(self, x: dict):
+        weight = Catalog.number(x['Name'], 'weight')
+        return f'{weight:.2f}' if weight is not None else ''
+
+    def get_value(self, x: dict):
+        value = Catalog.number(x['Name'], 'sell_value')
+        if value is None:
+            return ''
+        return f'{value:,} {Catalog.currencies[Catalog.number(x["Name"], "sell_value_currency")]}'
+
     def get_tooltip(self, index: QModelIndex):
         return self._rows[index.row()]['desc']
 
@@ -48,30 +140,42 @@ class ItemProxy(QSortFilterProxyModel):
         self._type = 'ALL'
         self._head = ''
         self._vocation = ''
+        self._sex = ''
+        self._accepted = ''  # `Catalog.bitset_flags()` of the source rows shown
+        self.setSortRole(AbstractModel.SortRole)
+
+    def setSourceModel(self, model: ItemModel):
+        super().setSourceModel(model)
+        model.modelReset.connect(self._update)
+        self._update()
+
+    def _update(self):
+        mod: ItemModel = self.sourceModel()
+        if mod is not None:
+            self._accepted = Catalog.bitset_flags(
+                mod.type_rows(self._type) & mod.usable_rows(self._vocation, self._sex) & mod.search(self._head),
+                mod.rowCount())
+        self.invalidateFilter()
 
     def set_type(self, typ='ALL'):
         self._type = typ
-        self.invalidateFilter()
+        self._update()
 
     def set_filter(self, head=''):
-        self._head = head.lower()
-        self.invalidateFilter()
+        """Show only the items matching `head`: a name prefix, `*text` for a substring, `~text` for a fuzzy match."""
+        self._head = head
+        self._update()
 
     def set_vocation(self, vocation: str):
         if vocation != self._vocation:
-            self.beginResetModel()
             self._vocation = vocation
-            self.endResetModel()
+            self._update()
+
+    def set_sex(self, sex: str):
+        """Show only the items usable by 'MALE' or 'FEMALE' characters ('' for both)."""
+        if sex != self._sex:
+            self._sex = sex
+            self._update()
 
     def filterAcceptsRow(self, source_row, source_parent):
-        mod: ItemModel = self.sourceModel()
-        row = mod.value(source_row)
-        if self._head and not row['Name'].lower().startswith(self._head):
-            return False
-        if self._type != 'ALL' and self._type != row['Type']:
-            return False
-        if self._vocation:
-            usable = row.get('usable', None)
-            if usable and not usable.get(self._vocation, True):
-                return False
-        return True
+        return self._accepted[source_row] == '1'
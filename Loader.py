@@ -0,0 +1,65 @@
+import logging
+from typing import Optional
+from xml.etree import ElementTree as ET
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from SaveData import SaveData, LoadCancelled
+from Telemetry import Telemetry
+
+log = logging.getLogger(__name__)
+
+
+class Loader(QObject):
+    """
+    Load a savefile in a worker thread.
+
+    Progress is reported per `SaveData.stages` through `progress`; exactly one of
+    `loaded` (with the complete `SaveData`, to be handed to `DDDAwrapper.adopt()`),
+    `failed` or `cancelled` is emitted at the end, after which the thread quits.
+    The owner must keep a reference to the `Loader` until then.
+    """
+    progress = pyqtSignal(int, str)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, fname: str, lazy: bool = True, telemetry: Optional[Telemetry] = None):
+        super().__init__()
+        self.fname = fname
+        self.lazy = lazy
+        self.telemetry = telemetry
+        self._thread: Optional[QThread] = None
+
+    def start(self):
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self.run)
+        self._thread.start()
+
+    def cancel(self):
+        if self._thread is not None:
+            self._thread.requestInterruption()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.wait()
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            save = SaveData.load(self.fname, self.lazy,
+                                 progress=self.progress.emit,
+                                 cancelled=self._thread.isInterruptionRequested,
+                                 telemetry=self.telemetry)
+        except LoadCancelled:
+            self.cancelled.emit()
+        except (OSError, ValueError, ET.ParseError) as e:
+            self.failed.emit(str(e))
+        except Exception as e:  # an exception escaping a slot of this thread would abort the program
+            log.exception('loading "%s" failed', self.fname)
+            self.failed.emit(f'ERROR: {e!r}')
+        else:
+            self.loaded.emit(save)
+        finally:
+            self._thread.quit()
@@ -0,0 +1,27 @@
+"""
+Logging setup.
+
+Every module logs through its own `logging.getLogger(__name__)`, passing
+arguments (not pre-formatted strings) so messages are only formatted when
+actually emitted; costly debug output is additionally guarded by
+`log.isEnabledFor(logging.DEBUG)`.
+
+Output is quiet by default (warnings and errors only). Debug output is
+enabled by `setup(debug=True)` (`--debug` in `DDDAedit` and `DDDAcli`) or by
+setting the `DDDA_DEBUG` environment variable, either to `1` (everything) or
+to a comma separated list of module names (e.g. `DDDA_DEBUG=DDDAwrapper,Equipment`).
+"""
+import logging
+import os
+from typing import Optional
+
+_FORMAT = '%(levelname)s: %(name)s: %(message)s'
+
+
+def setup(debug: Optional[bool] = None):
+    """Configure the root logger; `debug=None` means: as requested by `DDDA_DEBUG`."""
+    env = os.environ.get('DDDA_DEBUG', '')
+    logging.basicConfig(format=_FORMAT, level=logging.DEBUG if debug or env == '1' else logging.WARNING)
+    if debug is None and env not in ('', '0', '1'):
+        for name in env.split(','):
+            logging.getLogger(name.strip()).setLevel(logging.DEBUG)
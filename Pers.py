@@ -47,8 +47,9 @@ class Pers(QtWidgets.QWidget):
             self.vo.select(self.person_wrapper.vocation)
             self.se.set_stars(self.person_wrapper.vocation_level)
 
-            self.inventory_model = InventoryModel.InventoryModel()
-            self.inventory_proxy = InventoryModel.InventoryProxy()
+            if self.inventory_model is None:  # one per view, re-selected on every person
+                self.inventory_model = InventoryModel.InventoryModel()
+                self.inventory_proxy = InventoryModel.InventoryProxy()
             self.inventory_model.select(self.person_wrapper)
             self.inventory_proxy.setSourceModel(self.inventory_model)
             self.inventory.setModel(self.inventory_proxy)
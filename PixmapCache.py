@@ -0,0 +1,140 @@
+"""
+Pre-rendered pixmaps for the picture widgets (see `picwidgets`).
+
+`PicButton` used to rescale its full size image and `StarRating` to
+tessellate up to 9 antialiased polygons on every repaint; both now render
+once per (source, size, devicePixelRatio, state) key, keep the result in the
+bounded LRU of `PixmapCache.shared()` and repaint with a plain blit.
+
+The images of `resources/` (vocation icons, splash screen) are bundled in
+`resources/icons.bin`, a single blob of their file contents, read once:
+PyQt6 ships no resource compiler, so it is built here, like the catalog,
+automatically if missing or older than any of the images.
+"""
+import logging
+import marshal
+import os
+import struct
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from os import path, replace
+
+from PyQt6.QtGui import QPixmap
+
+log = logging.getLogger(__name__)
+
+_here = path.dirname(path.realpath(__file__))
+_resources = path.join(_here, 'resources')
+icons_file = path.join(_resources, 'icons.bin')
+_extensions = ('.webp', '.jpg', '.png')
+
+_MAGIC = b'DDDAico1'
+_HEADER = struct.Struct('<8sI')  # magic, marshal version
+
+
+def _sources() -> list[str]:
+    return sorted(x.path for x in os.scandir(_resources) if x.is_file() and x.name.endswith(_extensions))
+
+
+def _name(fname: str) -> str:
+    """Blob key of image `fname` (relative to the program directory, or absolute)."""
+    return path.relpath(path.join(_here, fname), _here).replace(os.sep, '/')
+
+
+def build(fname: str = icons_file) -> dict[str, bytes]:
+    """
+    Bundle the images of `resources/` into one blob.
+
+    :param fname: file to write, `None` to only return the bundle
+    :return: {name relative to the program directory: file content}
+    """
+    icons = {}
+    for source in _sources():
+        with open(source, 'rb') as fi:
+            icons[_name(source)] = fi.read()
+    if fname:
+        tmp = fname + '.tmp'
+        with open(tmp, 'wb') as fo:
+            fo.write(_HEADER.pack(_MAGIC, marshal.version))
+            fo.write(marshal.dumps(icons))
+        replace(tmp, fname)
+    return icons
+
+
+def _stale() -> bool:
+    if not path.isfile(icons_file):
+        return True
+    built = path.getmtime(icons_file)
+    return any(path.getmtime(x) > built for x in _sources())
+
+
+def _load() -> dict[str, bytes]:
+    try:
+        if _stale():
+            return build()
+        with open(icons_file, 'rb') as fi:
+            data = fi.read()
+    except OSError as e:
+        log.warning('cannot use "%s" (%s), reading images one by one', icons_file, e)
+        return {}
+    magic, version = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != marshal.version:
+        return build()
+    return marshal.loads(data[_HEADER.size:])
+
+
+class PixmapCache:
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """Process-wide pixmap cache."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __init__(self, limit: int = 16 * 2**20):
+        """:param limit: bytes of rendered pixels kept"""
+        self.limit = limit
+        self._icons = None
+        self._sources: dict[str, QPixmap] = {}
+        self._pixmaps: OrderedDict[Hashable, tuple[QPixmap, int]] = OrderedDict()  # (pixmap, bytes)
+        self._bytes = 0
+
+    def source(self, fname: str) -> QPixmap:
+        """Full size image `fname`, from the bundle if it is there; a null pixmap if it cannot be read."""
+        name = _name(fname)
+        if (pixmap := self._sources.get(name)) is None:
+            if self._icons is None:
+                self._icons = _load()
+            pixmap = QPixmap()
+            if name in self._icons:
+                pixmap.loadFromData(self._icons[name])
+            else:
+                log.debug('"%s" is not bundled', name)
+                pixmap.load(path.join(_here, name))
+            self._sources[name] = pixmap
+        return pixmap
+
+    def get(self, key: Hashable, render: Callable[[], QPixmap]) -> QPixmap:
+        """The pixmap stored under `key`, calling `render()` to produce it the first time."""
+        if (cached := self._pixmaps.get(key)) is not None:
+            self._pixmaps.move_to_end(key)
+            return cached[0]
+        pixmap = render()
+        nbytes = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        self._pixmaps[key] = pixmap, nbytes
+        self._bytes += nbytes
+        while self._bytes > self.limit and len(self._pixmaps) > 1:
+            _, (_, nbytes) = self._pixmaps.popitem(last=False)
+            self._bytes -= nbytes
+        return pixmap
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._bytes = 0
+
+
+if __name__ == '__main__':
+    icons = build()
+    print(f'{icons_file}: {len(icons)} images, {path.getsize(icons_file)} bytes')
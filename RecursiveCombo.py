@@ -1,7 +1,11 @@
+import logging
+
 from PyQt6.QtCore import pyqtSignal, QModelIndex, Qt, QSize, QPoint, QAbstractProxyModel
 from PyQt6.QtGui import QStandardItemModel, QStandardItem, QIcon
 from PyQt6.QtWidgets import QToolButton, QSizePolicy, QListView, QStyle
 
+log = logging.getLogger(__name__)
+
 
 class RecursiveCombo(QToolButton):
     _placeholderText = ''
@@ -191,20 +195,21 @@ class RecursiveCombo(QToolButton):
         self._emitIndexChanged(index)
 
     def itemClicked(self, index):
+        text = index.data()
         if self.model.hasChildren(index):
-            print(f'itremClicked({self.model.data(index)}): has children')
+            log.debug('itemClicked(%s): has children', text)
             self.setPopupRoot(index)
-        elif isinstance(index.data(Qt.ItemDataRole.UserRole), bool):
-            print(f'itremClicked({self.model.data(index)}): userRole: {index.data(Qt.ItemDataRole.UserRole)}')
+        elif isinstance(role := index.data(Qt.ItemDataRole.UserRole), bool):
+            log.debug('itemClicked(%s): userRole: %s', text, role)
             self.setPopupRoot(index.parent().parent())
         elif self.model.flags(index) & Qt.ItemFlag.ItemIsEnabled:
-            print(f'itremClicked({self.model.data(index)}): popping up')
+            log.debug('itemClicked(%s): popping up', text)
             self._currentIndex = index
             self.popup.hide()
-            self.setText(index.data())
+            self.setText(text)
             self._emitIndexChanged(index)
         else:
-            print(f'itremClicked({self.model.data(index)}): is disabled: ignoring')
+            log.debug('itemClicked(%s): is disabled: ignoring', text)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,649 @@
+"""
+Qt-free in-memory representation of a `DDDA.sav` savefile.
+
+Everything here can be built off the GUI thread (see `Loader`) or in another
+process (see `DDDAcli`) and then handed over to `DDDAwrapper` in one go.
+"""
+import contextlib
+import heapq
+import shutil
+import struct
+import zlib
+from collections import namedtuple
+from os import path, replace
+from time import strftime, gmtime
+from typing import Optional, Callable
+from xml.etree import ElementTree as ET
+
+import Catalog
+import Checksum
+from SaveXml import SaveXml
+from Telemetry import Telemetry
+
+Header = namedtuple('Header', ['u1', 'rsize', 'csize', 'u2', 'u3', 'u4', 'hash', 'u5'])
+
+
+FILE_SIZE = 524288  # savefiles are zero padded to this size
+MAX_NUM = 0x7fff  # data.mNum is s16
+MAX_LEVEL = 200
+MAX_VOCATION_LEVEL = 9
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+def backup(fname: str, ext: str = None) -> str:
+    """
+    Make a timestamped copy of `fname` (with extension replaced by `ext`, if given), unless it already exists.
+
+    :return: the name of the file to write
+    """
+    if ext:
+        fname = path.splitext(fname)[0] + ext
+    if path.isfile(fname):  # create backup if it doesn't exist
+        ts = path.getmtime(fname)
+        p, e = path.splitext(fname)
+        sf = f"{p}-{strftime('%Y%m%d_%H%M%S', gmtime(ts))}{e}"
+        if not path.isfile(sf):
+            shutil.copy2(fname, sf)
+    return fname
+
+
+def _check_range(what: str, value: int, low: int, high: int):
+    if not low <= value <= high:
+        raise ValueError(f'ERROR: {what} {value} is not in range [{low}..{high}]')
+
+
+class ItemRow:
+    """
+    A `sItemManager::cITEM_PARAM_DATA` row, compiled once at load time.
+
+    It holds direct references to its field elements and a cached copy of the
+    values models read most often, so reading them is a plain attribute access.
+    All writes go through `set()` (or `reset()`), which keeps the cache coherent
+    and routes the edit through `SaveData.set_value()`. `pos` is the position
+    of the row in its store, so `Person` edits never search for it.
+    """
+    __slots__ = ('xclass', 'save', 'fields', 'pos', 'num', 'item', 'flag', 'owner')
+
+    _cached = {
+        'data.mNum': 'num',
+        'data.mItemNo': 'item',
+        'data.mFlag': 'flag',
+        'data.mOwnerId': 'owner',
+    }
+
+    def __init__(self, xclass: ET.Element, save: 'SaveData', pos: int = -1):
+        self.xclass = xclass
+        self.save = save
+        self.pos = pos
+        self.fields = {x.get('name'): x for x in xclass}
+        self.reload()
+
+    def reload(self):
+        """Re-read the cached values from the elements."""
+        fields = self.fields
+        self.num = int(fields['data.mNum'].get('value'))
+        self.item = int(fields['data.mItemNo'].get('value'))
+        self.flag = int(fields['data.mFlag'].get('value'))
+        self.owner = int(fields['data.mOwnerId'].get('value'))
+
+    @property
+    def valid(self):
+        return self.num > 0
+
+    def set(self, field: str, value: int):
+        self.save.set_value(self.fields[field], str(value))
+        if (attr := self._cached.get(field)) is not None:
+            setattr(self, attr, value)
+
+    def reset(self, num=0, item=-1, flag=0):
+        """Overwrite the whole row: an empty slot by default, a fresh stack otherwise."""
+        self.set('data.mNum', num)
+        self.set('data.mItemNo', item)
+        self.set('data.mFlag', flag)
+        self.set('data.mChgNum', 0)
+        self.set('data.mDay1', 0)
+        self.set('data.mDay2', 0)
+        self.set('data.mDay3', 0)
+        self.set('data.mMutationPool', 0)
+        self.set('data.mOwnerId', 0)  # != 0 for EQUIPPED items
+        self.set('data.mKey', 0)
+
+
+class Sections:
+    """
+    Everything the `PersonWrapper`s need from the savefile, located in a single walk of the tree.
+
+    `player` and each of `pawns` map (tag, name) of the interesting elements
+    of a `cSAVE_DATA_CMC` to the first such element found in it.
+    If `save` is given, the item rows of every store are also compiled into
+    `ItemRow`s (`store_rows` and `storage_rows`).
+    """
+    _person_fields = {
+        ('array', 'mEquipItem'),
+        ('array', '(u8*)mNameStr'),
+        ('u8', 'mLevel'),
+        ('u8', 'mJob'),
+        ('array', 'mJobLevel'),
+    }
+
+    def __init__(self, data: ET.Element, save: Optional['SaveData'] = None):
+        self.player: Optional[dict] = None
+        self.pawns: list[dict] = []
+        self.stores: list[ET.Element] = []
+        self.storage: list[ET.Element] = []
+        self.storage_count: Optional[ET.Element] = None
+
+        stack = [(data, None)]
+        while stack:
+            elem, person = stack.pop()
+            if elem.get('type') == 'sItemManager::cITEM_PARAM_DATA':
+                continue  # item rows are the bulk of the file and hold nothing of interest here
+            name = elem.get('name')
+            if person is not None and (elem.tag, name) in self._person_fields:
+                person.setdefault((elem.tag, name), elem)
+            elif name == 'mPl' and elem.tag == 'class' and self.player is None:
+                person = self.player = {}
+            elif name == 'mCmc' and not self.pawns:
+                self.pawns = [{} for _ in elem]
+                stack.extend(zip(reversed(elem), reversed(self.pawns)))
+                continue
+            elif name == 'mItem' and elem.tag == 'array':
+                self.stores.extend(x for x in elem if x.get('type') == 'cSAVE_DATA_ITEM')
+            elif name == 'mStorageItem' and elem.tag == 'array':
+                self.storage.extend(x for x in elem if x.get('type') == 'sItemManager::cITEM_PARAM_DATA')
+            elif name == 'mStorageItemCount' and elem.tag == 'u32' and self.storage_count is None:
+                self.storage_count = elem
+            stack.extend((x, person) for x in reversed(elem))
+
+        self.store_rows: list[list[ItemRow]] = []
+        self.storage_rows: list[ItemRow] = []
+        if save is not None:
+            self.store_rows = [
+                [ItemRow(x, save, n) for n, x in
+                 enumerate(store.findall('./array/class[@type="sItemManager::cITEM_PARAM_DATA"]'))]
+                for store in self.stores]
+            self.storage_rows = [ItemRow(x, save, n) for n, x in enumerate(self.storage)]
+
+    def missing(self) -> list[str]:
+        """Names of the sections `Person` needs but were not found."""
+        out = []
+        if self.player is None:
+            out.append('mPl')
+        if len(self.pawns) < 3:
+            out.append('mCmc')
+        if len(self.stores) < 4:
+            out.append('mItem')
+        if self.storage_count is None:
+            out.append('mStorageItemCount')
+        return out
+
+
+class Person:
+    """
+    One of the characters (or the Storage) in a `SaveData`.
+
+    Get them through `SaveData.person()`, there must be only one per store.
+    `DDDAwrapper.PersonWrapper` wraps one of these, adding Qt signals.
+
+    Adding items relies on a heap of free rows and an (item, flag) -> row
+    index of existing stacks, both built on first use and kept up to date by
+    the methods below; entries invalidated by edits made elsewhere are
+    detected and dropped on lookup.
+
+    Edits can be grouped in a transaction with `batch()`.
+    """
+    persons = ('Player', 'Main Pawn', 'Pawn A', 'Pawn B', 'Storage')
+
+    def __init__(self, save: 'SaveData', who: str):
+        if who not in self.persons:
+            raise ValueError(f'Unknown person "{who}"')
+        sections = save.sections
+        self.save = save
+        self.who = who
+        self.index = self.persons.index(who)
+        pdata = None
+        if self.index < 4:
+            pdata = sections.player if self.index == 0 else sections.pawns[self.index - 1]
+            self.rows: list[ItemRow] = sections.store_rows[self.index]
+            self._count = sections.stores[self.index].find('./u32[@name="mItemCount"]')
+        else:
+            self.rows = sections.storage_rows
+            self._count = sections.storage_count
+        if pdata is not None:
+            self.equipment: Optional[list[ItemRow]] = [
+                ItemRow(x, save)
+                for x in pdata[('array', 'mEquipItem')].findall('.//class[@type="sItemManager::cITEM_PARAM_DATA"]')]
+            self._name = pdata[('array', '(u8*)mNameStr')].findall('./u8')
+            self._level = pdata.get(('u8', 'mLevel'))
+            self._voc = pdata.get(('u8', 'mJob'))
+            self._vlevels = pdata[('array', 'mJobLevel')].findall('./u8')
+        else:
+            self.equipment = None
+            self._name = None
+            self._level = None
+            self._voc = None
+            self._vlevels = None
+        self._free: Optional[list[int]] = None  # built on first add
+        self._stacks: dict[tuple[int, int], int] = {}
+        self._touched: Optional[set[int]] = None  # rows edited in the current batch()
+        self._pending = 0  # item count change not yet written by batch()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group edits in a transaction.
+
+        The item count is written once, when the block ends; should the block
+        raise, every edit made in it (to any element of the savefile) is undone.
+        Yields the set of the positions of the rows edited so far. Can be nested,
+        only the outermost block counts. Batches of different persons nest too:
+        the inner one undoes only its own edits, the outer one everything.
+        """
+        if self._touched is not None:
+            yield self._touched
+            return
+        self._touched = touched = set()
+        self._pending = 0
+        owner = self.save.journal is None  # else another person's batch is open: share its journal
+        if owner:
+            self.save.journal = []
+        mark = len(self.save.journal)
+        try:
+            yield touched
+            pending, self._pending, self._touched = self._pending, 0, None
+            self.tot_inc(pending)
+        except BaseException:
+            self.save.rollback(mark)
+            raise
+        finally:
+            self._touched = None
+            self._pending = 0
+            if owner:
+                self.save.journal = None
+
+    @property
+    def batch_active(self) -> bool:
+        return self._touched is not None
+
+    def _touch(self, pos: int):
+        if self._touched is not None:
+            self._touched.add(pos)
+
+    @property
+    def name(self) -> str:
+        name = '???'
+        if self._name is not None:
+            name = ''
+            for chx in self._name:
+                chi = int(chx.get('value'))
+                if chi > 0:
+                    name += chr(chi)
+        return name
+
+    @property
+    def level(self) -> int:
+        return int(self._level.get('value')) if self._level is not None else -1
+
+    @level.setter
+    def level(self, value: int):
+        _check_range('level', value, 1, MAX_LEVEL)
+        if self._level is not None:
+            self.save.set_value(self._level, str(value))
+
+    @property
+    def vocation(self) -> int:
+        return int(self._voc.get('value')) if self._voc is not None else -1
+
+    @vocation.setter
+    def vocation(self, value: int):
+        _check_range('vocation', value, 1, len(Catalog.vocations))
+        if self._voc is not None:
+            self.save.set_value(self._voc, str(value))
+
+    @property
+    def vocation_level(self) -> int:
+        return int(self._vlevels[self.vocation - 1].get('value')) if self._level is not None else -1
+
+    @vocation_level.setter
+    def vocation_level(self, value: int):
+        _check_range('vocation level', value, 1, MAX_VOCATION_LEVEL)
+        if self._vlevels is not None:
+            self.save.set_value(self._vlevels[self.vocation - 1], str(value))
+
+    @property
+    def count(self) -> int:
+        return int(self._count.get('value')) + self._pending if self._count is not None else -1
+
+    def _build_index(self):
+        """Build the heap of free rows and the (item, flag) -> row index of existing stacks."""
+        self._free = [n for n, row in enumerate(self.rows) if row.num <= 0]  # sorted, hence a heap
+        self._stacks = {}
+        for n, row in enumerate(self.rows):
+            if row.num > 0:
+                self._stacks.setdefault((row.item, row.flag), n)
+
+    def _unindex(self, pos: int):
+        """Forget row `pos` as a stack, before it is emptied or changes flag."""
+        row = self.rows[pos]
+        if self._free is not None and self._stacks.get((row.item, row.flag)) == pos:
+            del self._stacks[(row.item, row.flag)]
+
+    def _stack(self, key: tuple[int, int]) -> int:
+        """Position of a stack of `key` (item, flag), -1 if none."""
+        pos = self._stacks.get(key, -1)
+        if pos >= 0:
+            row = self.rows[pos]
+            if row.num <= 0 or (row.item, row.flag) != key:  # changed behind our back
+                del self._stacks[key]
+                return -1
+        return pos
+
+    def _take_free(self) -> int:
+        """Position of the first free row, -1 if full."""
+        while self._free:
+            pos = heapq.heappop(self._free)
+            if self.rows[pos].num <= 0:
+                return pos
+        return -1
+
+    def _position(self, row: ItemRow) -> int:
+        pos = row.pos
+        if not 0 <= pos < len(self.rows) or self.rows[pos] is not row:
+            raise ValueError(f'ERROR: row is not in {self.who}')
+        return pos
+
+    def row_inc(self, row: ItemRow, inc: int) -> int:
+        """
+        Change the count of `row` by `inc`, emptying it if it drops to zero; return its position.
+
+        Decrementing an empty row does nothing, the count never goes above `MAX_NUM`.
+        It may `raise` `ValueError` if `row` is not one of `rows`.
+        """
+        idx = self._position(row)
+        num = row.num
+        if num <= 0 and inc <= 0:
+            return idx
+        self._touch(idx)
+        n = min(num + inc, MAX_NUM)
+        if n > 0:
+            row.set('data.mNum', n)
+        else:
+            self._unindex(idx)
+            row.reset()
+            n = 0
+            if self._free is not None:
+                heapq.heappush(self._free, idx)
+        self.tot_inc(n - num)
+        return idx
+
+    def row_set_flag(self, row: ItemRow, value: int):
+        idx = self._position(row)
+        self._touch(idx)
+        self._unindex(idx)
+        row.set('data.mFlag', value)
+        if self._free is not None and row.num > 0:
+            self._stacks.setdefault((row.item, row.flag), idx)
+
+    @staticmethod
+    def _check_num(num: int):
+        if not 1 <= num <= MAX_NUM:
+            raise ValueError(f'ERROR: cannot add {num} items, a row holds 1 to {MAX_NUM}')
+
+    def _add(self, idx: int, num: int) -> int:
+        if self._free is None:
+            self._build_index()
+        item = Catalog.all_by_id[idx]['ID']
+        pos = self._stack((item, 1))
+        if pos >= 0 and self.rows[pos].num + num <= MAX_NUM:
+            self._touch(pos)
+            self.rows[pos].set('data.mNum', self.rows[pos].num + num)
+            return pos
+        pos = self._take_free()
+        if pos >= 0:
+            self._touch(pos)
+            self.rows[pos].reset(num, item, 1)
+            self._stacks[(item, 1)] = pos
+        return pos
+
+    def add(self, idx: int, num: int = 1) -> int:
+        """
+        Add `num` items `idx`, merging them into an existing stack if possible,
+        else in the first free row; return the position of the row or -1 if full.
+
+        It may `raise` `ValueError` if `num` is not in 1..`MAX_NUM`.
+        """
+        self._check_num(num)
+        pos = self._add(idx, num)
+        if pos >= 0:
+            self.tot_inc(num)
+        return pos
+
+    def add_many(self, items) -> list[int]:
+        """
+        Add many items at once (see `add()`), updating the item count once.
+
+        :param items: item IDs, or (item ID, count) pairs
+        :return: the position of the row of each item, -1 for those not fitting
+        """
+        items = [item if isinstance(item, tuple) else (item, 1) for item in items]
+        for idx, num in items:  # all or nothing
+            self._check_num(num)
+        positions = []
+        total = 0
+        for idx, num in items:
+            pos = self._add(idx, num)
+            if pos >= 0:
+                total += num
+            positions.append(pos)
+        self.tot_inc(total)
+        return positions
+
+    def tot_inc(self, inc: int):
+        if self._touched is not None:
+            self._pending += inc
+        elif self._count is not None and inc:
+            self.save.set_value(self._count, str(self.count + inc))
+
+    def summary(self, items: bool = False) -> dict:
+        """JSON friendly description, with the content of every non empty row if `items`."""
+        out = {'person': self.who, 'count': self.count}
+        if self._name is not None:
+            out.update(name=self.name, level=self.level, vocation=self.vocation,
+                       vocation_level=self.vocation_level,
+                       equipment=[row.item if row.valid else None for row in self.equipment])
+        if items:
+            out['items'] = [{'id': row.item, 'name': Catalog.all_by_id.get(row.item, {}).get('Name'),
+                             'num': row.num, 'flag': row.flag}
+                            for row in self.rows if row.valid]
+        return out
+
+
+class SaveData:
+    """
+    A savefile loaded in memory.
+
+    In `lazy` mode only the sections handled by `PersonWrapper` are parsed
+    (see `SaveXml`) and `data` is a skeleton root holding them; otherwise the
+    whole document is parsed into a full ElementTree.
+
+    The diff baseline is the original buffer itself in `lazy` mode (it is
+    needed anyway to save by patching) and the compressed payload otherwise,
+    re-inflated only when `diff_regions()` is called.
+    """
+    stages = ('read', 'checksum', 'inflate', 'parse', 'index')
+
+    def __init__(self, fname: str):
+        self.fname = fname
+        self.header: Optional[Header] = None
+        self.lazy: Optional[SaveXml] = None
+        self.data: Optional[ET.Element] = None
+        self.compressed: Optional[bytes] = None
+        self.sections: Optional[Sections] = None
+        self.dirty: bool = False
+        self.telemetry = Telemetry()
+        self._persons: dict[str, Person] = {}
+        self.journal: Optional[list[tuple[ET.Element, str]]] = None  # (element, previous value), see `Person.batch()`
+
+    @classmethod
+    def load(cls, fname: str, lazy: bool = True,
+             progress: Callable[[int, str], None] = None, cancelled: Callable[[], bool] = None,
+             telemetry: Optional[Telemetry] = None):
+        """
+        Read a savefile from disk, stage by stage (see `stages`).
+
+        It may `raise` `ValueError` in case file is corrupted, `OSError` if it
+        cannot be read and `LoadCancelled` if `cancelled()` returns True.
+
+        :param fname: Name of the file to read
+        :param lazy: parse only the sections the editor needs
+        :param progress: called with stage number and name before each stage
+        :param cancelled: polled before each stage
+        :param telemetry: where to record a span per stage (a new `Telemetry` by default),
+            kept as `telemetry`
+        """
+        self = cls(fname)
+        if telemetry is not None:
+            self.telemetry = telemetry
+
+        def stage(n: int):
+            if cancelled is not None and cancelled():
+                raise LoadCancelled(f'loading "{fname}" cancelled before {cls.stages[n]}')
+            if progress is not None:
+                progress(n, cls.stages[n])
+            self.telemetry.mark(cls.stages[n])
+
+        with self.telemetry.capture():
+            stage(0)
+            with open(fname, "rb") as fi:
+                h = fi.read(32)
+                if len(h) < 32:
+                    raise ValueError(f'ERROR: file too short ({len(h)} bytes), not a savefile')
+                self.header = Header(*struct.unpack('<IIIIIIII', h))
+                buf = fi.read(self.header.csize)
+            stage(1)
+            crc = Checksum.crc32(buf)
+            if crc != self.header.hash:
+                raise ValueError(f'ERROR: hash mismatch ({crc} != {self.header.hash})')
+            stage(2)
+            try:
+                xml = zlib.decompress(buf)
+            except zlib.error as e:
+                raise ValueError(f'ERROR: corrupted data ({e})') from e
+            stage(3)
+            if lazy:
+                self.lazy = SaveXml(xml)
+                self.data = self.lazy.root
+            else:
+                self.data = ET.fromstring(xml)
+                self.compressed = buf
+            stage(4)
+            self.sections = Sections(self.data, self)
+            if missing := self.sections.missing():
+                raise ValueError(f'ERROR: not a savefile, missing {", ".join(missing)}')
+        return self
+
+    def person(self, who: str) -> Person:
+        """The (only) `Person` for `who`, see `Person.persons`."""
+        if who not in self._persons:
+            self._persons[who] = Person(self, who)
+        return self._persons[who]
+
+    def set_value(self, elem: ET.Element, value: str):
+        """Set the `value` attribute of `elem`; all edits go through here so they can be saved incrementally."""
+        if self.journal is not None:
+            self.journal.append((elem, elem.get('value')))
+        if self.lazy is not None:
+            self.lazy.set(elem, value)
+        else:
+            elem.set('value', value)
+        self.dirty = True
+
+    def rollback(self, mark: int = 0):
+        """Undo the edits recorded in `journal` after its first `mark` entries (see `Person.batch()`)."""
+        journal, self.journal = self.journal, None
+        for elem, value in reversed(journal[mark:]):
+            self.set_value(elem, value)
+        del journal[mark:]
+        self.journal = journal
+        # any cached row may hold an undone value
+        for rows in self.sections.store_rows + [self.sections.storage_rows]:
+            for row in rows:
+                row.reload()
+        for person in self._persons.values():
+            for row in person.equipment or ():
+                row.reload()
+            person._free = None  # rebuilt on next add
+
+    def to_xml(self) -> bytes:
+        if self.lazy is not None:
+            return self.lazy.to_xml()
+        return b'<?xml version="1.0" encoding="utf-8"?>\n' + ET.tostring(self.data).replace(b' />', b'/>')
+
+    def to_bytes(self) -> bytes:
+        """
+        Compress and checksum the current content into a complete savefile image.
+
+        It may `raise` `ValueError` if the result does not fit in `FILE_SIZE`.
+        """
+        with self.telemetry.span('serialize'):
+            sss = self.to_xml()
+        with self.telemetry.span('compress'):
+            z = zlib.compress(sss)
+        with self.telemetry.span('save checksum'):
+            crc = Checksum.crc32(z)
+        hdr = Header(21, len(sss), len(z), 860693325, 0, 860700740, crc, 1079398965)
+        h = struct.pack('<IIIIIIII', *hdr)
+        if len(h) + len(z) > FILE_SIZE:
+            raise ValueError(f'ERROR: compressed savefile too big ({len(h) + len(z)} > {FILE_SIZE})')
+        return h + z + b'\0' * (FILE_SIZE - len(h) - len(z))
+
+    def to_file(self, fname: str):
+        """Write the savefile to `fname`, atomically replacing it."""
+        data = self.to_bytes()
+        tmp = fname + '.tmp'
+        with self.telemetry.span('write'):
+            with open(tmp, 'wb') as fo:
+                fo.write(data)
+            replace(tmp, fname)
+        self.dirty = False
+
+    def diff_regions(self):
+        """
+        Yield the regions that may differ from the file on disk, in document order.
+
+        Each region is (old start, old lines, new start, new lines), with
+        1-based line numbers, ready for `Diff.hunks()`. Edits never add or
+        remove lines, so each run of consecutive changed lines is a region;
+        should the line counts differ anyway (full mode re-serializes the
+        whole tree) the region is the whole document minus its common head and tail.
+        """
+        if self.lazy is not None:
+            changed = self.lazy.changed_lines()
+        else:
+            old = zlib.decompress(self.compressed).splitlines()
+            new = self.to_xml().splitlines()
+            if len(old) != len(new):
+                head = 0
+                while head < min(len(old), len(new)) and old[head] == new[head]:
+                    head += 1
+                tail = 0
+                while tail < min(len(old), len(new)) - head and old[-1 - tail] == new[-1 - tail]:
+                    tail += 1
+                yield (head + 1, [x.decode() for x in old[head:len(old) - tail]],
+                       head + 1, [x.decode() for x in new[head:len(new) - tail]])
+                return
+            changed = ((n, a, b) for n, (a, b) in enumerate(zip(old, new)) if a != b)
+        start, old, new = None, [], []
+        for n, a, b in changed:
+            if start is not None and n != start + len(old):
+                yield start + 1, old, start + 1, new
+                old, new = [], []
+            if not old:
+                start = n
+            old.append(a.decode())
+            new.append(b.decode())
+        if old:
+            yield start + 1, old, start + 1, new
@@ -0,0 +1,179 @@
+"""
+Section-scoped ("lazy") access to the decompressed `DDDA.sav` XML.
+
+The savefile XML is several megabytes long, but the editor only touches a few
+sections of it. Instead of building a full ElementTree, `SaveXml` locates the
+byte spans of the interesting sections and incrementally feeds only those spans
+to an `XMLParser`. The resulting subtrees hang, in document order, from a
+skeleton root mirroring the real one, so the usual `find()`/`findall()` paths
+keep working; everything else stays as opaque bytes in the original buffer and
+is copied verbatim on re-serialization.
+
+While loading, the byte offset of every materialized element is recorded, so
+that edits (which only ever change `value="..."` attributes) can be saved by
+patching just those attributes into the original buffer: the output keeps the
+game's formatting byte for byte and saving costs proportionally to the number
+of edits rather than to the size of the document.
+"""
+import re
+from typing import Optional
+from xml.etree import ElementTree as ET
+
+_CHUNK = 1 << 16
+_START_TAG = re.compile(rb'<[^/!?][^>]*>')
+_VALUE = b' value="'
+
+
+def _escape(value: str) -> bytes:
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').encode()
+
+
+class SaveXml:
+    sections = ('mPl', 'mCmc', 'mItem', 'mStorageItem', 'mStorageItemCount')
+
+    def __init__(self, buf: bytes, sections=None):
+        """
+        Locate and parse the sections of interest.
+
+        It may `raise` `ValueError` if the buffer is not a well-formed savefile.
+
+        :param buf: decompressed XML, as read from disk
+        :param sections: names (`name` attribute) of the elements to materialize
+        """
+        self.buf = buf
+        self.spans: list[tuple[int, int, ET.Element]] = []
+        self.root: Optional[ET.Element] = None
+        self.offsets: dict[ET.Element, int] = {}
+        self.edits: set[ET.Element] = set()
+        self._locate(sections or self.sections)
+
+    def _skeleton(self) -> ET.Element:
+        """Return an empty copy of the document root element."""
+        pos = self.buf.find(b'<')
+        while pos >= 0 and self.buf[pos + 1] in b'?!':
+            pos = self.buf.find(b'<', pos + 1)
+        if pos < 0:
+            raise ValueError('ERROR: cannot find XML root element')
+        close = self.buf.index(b'>', pos)
+        return ET.fromstring(self.buf[pos:close].rstrip(b'/') + b'/>')
+
+    def _span(self, start: int) -> int:
+        """Return the end offset (exclusive) of the element starting at `start`."""
+        buf = self.buf
+        close = buf.index(b'>', start)
+        if buf[close - 1] == ord('/'):
+            return close + 1
+        tag = re.compile(rb'[\w:.]+').match(buf, start + 1).group(0)
+        depth = 1
+        for m in re.compile(rb'<(/?)' + re.escape(tag) + rb'\b[^>]*?(/?)>').finditer(buf, close + 1):
+            if m.group(1):
+                depth -= 1
+                if depth == 0:
+                    return m.end()
+            elif not m.group(2):
+                depth += 1
+        raise ValueError(f'ERROR: unterminated element at offset {start}')
+
+    def _parse(self, start: int, end: int) -> ET.Element:
+        parser = ET.XMLParser()
+        view = memoryview(self.buf)
+        for pos in range(start, end, _CHUNK):
+            parser.feed(view[pos:min(pos + _CHUNK, end)])
+        return parser.close()
+
+    def _locate(self, sections):
+        found = []
+        for name in sections:
+            needle = f' name="{name}"'.encode()
+            pos = self.buf.find(needle)
+            while pos >= 0:
+                start = self.buf.rfind(b'<', 0, pos)
+                found.append((start, self._span(start)))
+                pos = self.buf.find(needle, pos + len(needle))
+        found.sort()
+
+        self.root = self._skeleton()
+        last = 0
+        for start, end in found:
+            if start < last:
+                continue  # nested in an already materialized section
+            elem = self._parse(start, end)
+            self.offsets.update(zip(elem.iter(), (m.start() for m in _START_TAG.finditer(self.buf, start, end))))
+            self.root.append(elem)
+            self.spans.append((start, end, elem))
+            last = end
+
+    def set(self, elem: ET.Element, value: str):
+        """
+        Set the `value` attribute of a materialized element, recording the edit.
+
+        All edits must go through here, direct `elem.set()` calls would be lost on save.
+        """
+        elem.set('value', value)
+        self.edits.add(elem)
+
+    def _patches(self) -> list[tuple[int, int, bytes]]:
+        """
+        Return (start, end, new value) of every edited `value` attribute, in document order.
+
+        It may `raise` `ValueError` if an edited element has no `value` attribute on disk.
+        """
+        buf = self.buf
+        patches = []
+        for elem in self.edits:
+            start = self.offsets[elem]
+            pos = buf.find(_VALUE, start, buf.index(b'>', start))
+            if pos < 0:
+                raise ValueError(f'ERROR: element <{elem.tag}> at offset {start} has no value attribute')
+            pos += len(_VALUE)
+            patches.append((pos, buf.index(b'"', pos), _escape(elem.get('value'))))
+        patches.sort()
+        return patches
+
+    def to_xml(self) -> bytes:
+        """
+        Re-serialize the document patching the edited `value` attributes into the original buffer.
+
+        It may `raise` `ValueError` if an edited element has no `value` attribute on disk.
+        """
+        buf = self.buf
+        pieces = []
+        last = 0
+        for start, end, value in self._patches():
+            pieces.append(buf[last:start])
+            pieces.append(value)
+            last = end
+        pieces.append(buf[last:])
+        return b''.join(pieces)
+
+    def changed_lines(self):
+        """
+        Yield (line number, original, current) for every line an edit actually changed.
+
+        Patches never add or remove line breaks, so line numbers are the same in
+        both versions and only the edited lines are ever materialized.
+        """
+        buf = self.buf
+        lineno = counted = 0
+        patches = self._patches()
+        i = 0
+        while i < len(patches):
+            first = patches[i][0]
+            begin = buf.rfind(b'\n', 0, first) + 1
+            end = buf.find(b'\n', first)
+            if end < 0:
+                end = len(buf)
+            pieces = []
+            last = begin
+            while i < len(patches) and patches[i][0] < end:
+                start, stop, value = patches[i]
+                pieces.append(buf[last:start])
+                pieces.append(value)
+                last = stop
+                i += 1
+            pieces.append(buf[last:end])
+            lineno += buf.count(b'\n', counted, begin)
+            counted = begin
+            old, new = buf[begin:end], b''.join(pieces)
+            if old != new:
+                yield lineno, old, new
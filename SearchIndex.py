@@ -0,0 +1,93 @@
+"""
+Name search index for the item filters.
+
+Built once over a list of names, it answers with the set of matching row
+numbers directly, without visiting the rows that do not match:
+
+    prefix     names sorted (case folded): a prefix is a bisected range, O(log n + matches)
+    substring  posting sets of every 1, 2 and 3 character gram of every name: a
+               query of up to 3 characters is a single lookup, a longer one
+               intersects the sets of its trigrams (smallest first) and checks
+               the few candidates left
+    fuzzy      names sharing enough padded trigrams with the query, tolerating typos
+
+`search()` picks one from the query syntax: plain text is a prefix, `*text`
+a substring and `~text` a fuzzy match. Everything here is Qt-free.
+"""
+from bisect import bisect_left
+from collections import Counter
+
+
+class SearchIndex:
+    def __init__(self, names: list[str]):
+        self._names = [x.casefold() for x in names]
+        order = sorted(range(len(names)), key=self._names.__getitem__)
+        self._sorted = [self._names[n] for n in order]
+        self._order = order
+        self._all = frozenset(range(len(names)))
+        grams: dict[str, set] = {}
+        trigrams: dict[str, set] = {}
+        for n, name in enumerate(self._names):
+            for size in (1, 2, 3):
+                for i in range(len(name) - size + 1):
+                    grams.setdefault(name[i:i + size], set()).add(n)
+            for gram in self._trigrams(name):
+                trigrams.setdefault(gram, set()).add(n)
+        self._grams = {k: frozenset(v) for k, v in grams.items()}
+        self._padded = {k: frozenset(v) for k, v in trigrams.items()}
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _trigrams(text: str) -> set[str]:
+        text = f'  {text} '
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def prefix(self, head: str) -> frozenset:
+        """Rows whose name starts with `head` (case insensitive)."""
+        head = head.casefold()
+        if not head:
+            return self._all
+        start = bisect_left(self._sorted, head)
+        end = bisect_left(self._sorted, head + '\U0010ffff', start)
+        return frozenset(self._order[start:end])
+
+    def substring(self, text: str) -> frozenset:
+        """Rows whose name contains `text` (case insensitive)."""
+        text = text.casefold()
+        if not text:
+            return self._all
+        if len(text) <= 3:
+            return self._grams.get(text, frozenset())
+        sets = sorted((self._grams.get(text[i:i + 3], frozenset()) for i in range(len(text) - 2)), key=len)
+        candidates = sets[0].intersection(*sets[1:])
+        return frozenset(n for n in candidates if text in self._names[n])
+
+    def fuzzy(self, text: str, threshold: float = 0.5) -> frozenset:
+        """Rows whose name shares at least `threshold` of the padded trigrams of `text`."""
+        grams = self._trigrams(text.casefold())
+        if not text:
+            return self._all
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._padded.get(gram, ()))
+        need = threshold * len(grams)
+        return frozenset(n for n, count in hits.items() if count >= need)
+
+    def search(self, query: str) -> frozenset:
+        """Rows matching `query`: `*text` for a substring, `~text` for a fuzzy match, else a prefix."""
+        if query.startswith('*'):
+            return self.substring(query[1:])
+        if query.startswith('~'):
+            return self.fuzzy(query[1:])
+        return self.prefix(query)
+
+
+if __name__ == '__main__':
+    import sys
+    import Catalog
+
+    index = SearchIndex(Catalog.catalog().names)
+    for query in sys.argv[1:] or ['wake', '*stone', '~wakstone']:
+        print(f'{query}: {sorted(Catalog.catalog().names[n] for n in index.search(query))}')
@@ -0,0 +1,179 @@
+"""
+Columnar snapshot of every item store, for auditing savefiles.
+
+`Snapshot(save)` copies the non empty item rows of the Player, the three
+pawns and the Storage into one NumPy array per field (struct of arrays),
+which vectorized queries then join against catalog columns (`Type`, `Weight`
+and `SellValue`, see `Catalog.column()`):
+
+    snap = Snapshot(SaveData.load('DDDA.sav'))
+    snap.weight()                  # {'Player': 42.6, 'Main Pawn': ..., 'Storage': ...}
+    snap.count(snap.flag & GOLD_FORGED != 0)
+    snap.duplicates()              # {item ID: number of rows holding it}
+
+NumPy is an optional dependency (`pip install numpy`), only needed here;
+`available()` tells whether it is installed. Everything here is Qt-free.
+"""
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+import Catalog
+from SaveData import SaveData, Person
+
+GOLD_FORGED = 0x0400    # see `DDDAwrapper.Tier`
+SILVER_FORGED = 0x0200
+DRAGONFORGED = 0x0040
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _require():
+    if np is None:
+        raise ImportError('ERROR: Snapshot needs NumPy (pip install numpy)')
+
+
+class CatalogColumns:
+    """The catalog as columns, sorted by item ID so rows can be joined with `np.searchsorted()`."""
+    def __init__(self):
+        _require()
+        cat = Catalog.catalog()
+        order = sorted(cat.by_id.items())
+        self.types: list[str] = cat.types
+        rows = np.array([n for _, n in order])
+        self.id = np.array([x[0] for x in order], dtype=np.int32)
+        self.type = np.array([cat.type_no(n) for _, n in order], dtype=np.int16)
+        self.weight = np.frombuffer(Catalog.column('weight'), dtype=np.float64)[rows]
+        sell_value = np.frombuffer(Catalog.column('sell_value'), dtype=np.int32)[rows]
+        self.sell_value = np.where(sell_value == Catalog.NULL, np.nan, sell_value)
+
+    def lookup(self, items) -> 'np.ndarray':
+        """Catalog row of each item ID in `items`, -1 for unknown IDs."""
+        pos = np.searchsorted(self.id, items).clip(0, len(self.id) - 1)
+        return np.where(self.id[pos] == items, pos, -1)
+
+
+_columns: Optional[CatalogColumns] = None
+
+
+def catalog_columns() -> CatalogColumns:
+    global _columns
+    if _columns is None:
+        _columns = CatalogColumns()
+    return _columns
+
+
+class Snapshot:
+    """One entry per non empty item row of every store; `store` indexes `stores`."""
+    stores = Person.persons
+    _fields = {
+        'item': 'data.mItemNo',
+        'num': 'data.mNum',
+        'flag': 'data.mFlag',
+        'owner': 'data.mOwnerId',
+        'chg_num': 'data.mChgNum',
+        'day1': 'data.mDay1',
+        'day2': 'data.mDay2',
+        'day3': 'data.mDay3',
+        'mutation_pool': 'data.mMutationPool',
+        'key': 'data.mKey',
+    }
+
+    def __init__(self, save: SaveData):
+        _require()
+        store, row = [], []
+        values = {name: [] for name in self._fields}
+        for n, who in enumerate(self.stores):
+            for pos, x in enumerate(save.person(who).rows):
+                if not x.valid:
+                    continue
+                store.append(n)
+                row.append(pos)
+                for name, field in self._fields.items():
+                    elem = x.fields.get(field)
+                    values[name].append(int(elem.get('value')) if elem is not None else 0)
+        self.store = np.array(store, dtype=np.int8)
+        self.row = np.array(row, dtype=np.int32)
+        for name, column in values.items():
+            setattr(self, name, np.array(column, dtype=np.int64 if name == 'key' else np.int32))
+        self.catalog = catalog_columns()
+        self._cat = self.catalog.lookup(self.item)  # catalog row of every item, -1 if unknown
+
+    def __len__(self):
+        return len(self.item)
+
+    @property
+    def type(self) -> 'np.ndarray':
+        """Type name of every row ('' for unknown items)."""
+        names = np.array(self.catalog.types + [''], dtype=object)
+        return names[np.where(self._cat >= 0, self.catalog.type[self._cat], -1)]
+
+    def _join(self, column: 'np.ndarray') -> 'np.ndarray':
+        return np.where(self._cat >= 0, column[self._cat], np.nan)
+
+    @property
+    def unit_weight(self) -> 'np.ndarray':
+        return self._join(self.catalog.weight)
+
+    @property
+    def unit_value(self) -> 'np.ndarray':
+        return self._join(self.catalog.sell_value)
+
+    def _per_store(self, values: 'np.ndarray', where=None) -> dict[str, float]:
+        values = np.nan_to_num(values)
+        if where is not None:
+            values = values * where
+        totals = np.bincount(self.store, weights=values, minlength=len(self.stores))
+        return {who: float(x) for who, x in zip(self.stores, totals)}
+
+    def count(self, where=None) -> dict[str, int]:
+        """Number of items (counting stacks in full) per store, optionally only the rows in the `where` mask."""
+        return {who: int(x) for who, x in self._per_store(self.num, where).items()}
+
+    def weight(self, where=None) -> dict[str, float]:
+        """Total weight per store, items of unknown weight counting as 0."""
+        return self._per_store(self.num * self.unit_weight, where)
+
+    def value(self, where=None) -> dict[str, float]:
+        """Total selling price per store."""
+        return self._per_store(self.num * self.unit_value, where)
+
+    def of_type(self, *types: str) -> 'np.ndarray':
+        """Mask of the rows holding items of one of `types`."""
+        codes = [n for n, t in enumerate(self.catalog.types) if t in types]
+        return (self._cat >= 0) & np.isin(self.catalog.type[self._cat], codes)
+
+    def duplicates(self, where=None) -> dict[int, int]:
+        """Item IDs held in more than one row (across all stores), with their number of rows."""
+        items = self.item if where is None else self.item[where]
+        ids, counts = np.unique(items, return_counts=True)
+        return {int(i): int(c) for i, c in zip(ids[counts > 1], counts[counts > 1])}
+
+    def unknown(self) -> list[int]:
+        """Item IDs missing from the catalog."""
+        return [int(x) for x in np.unique(self.item[self._cat < 0])]
+
+    def audit(self) -> dict:
+        """JSON friendly summary of the usual questions."""
+        return {
+            'rows': len(self),
+            'count': self.count(),
+            'weight': {who: round(x, 2) for who, x in self.weight().items()},
+            'value': {who: int(x) for who, x in self.value().items()},
+            'gold_forged': self.count(self.flag & GOLD_FORGED != 0),
+            'duplicates': self.duplicates(),
+            'unknown': self.unknown(),
+        }
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    snap = Snapshot(SaveData.load(sys.argv[1] if len(sys.argv) > 1 else 'DDDA.sav'))
+    print(json.dumps(snap.audit(), indent=2))
@@ -1,6 +1,6 @@
 from PyQt6.QtCore import QAbstractListModel, Qt, pyqtProperty, pyqtSignal, QSortFilterProxyModel
 
-import Fandom
+import Catalog
 
 _vocations = [
     'Fighter', 'Strider', 'Mage',
@@ -14,12 +14,19 @@ class SplitItemModel(QAbstractListModel):
     selected_changed = pyqtSignal(str)
 
     _data = {'ALL': []}
-    for item in Fandom.all_by_id.values():
+    _usable = {'ALL': []}  # 'usable' catalog column of the items in `_data`
+    for item, pos in zip(Catalog.all_by_id.values(), Catalog.catalog().by_id.values()):
+        if not Catalog.catalog().sources(pos) & Catalog.FROM_FANDOM:
+            continue  # known only to the game: not offered
         typ = item['Type']
         if typ not in _data:
             _data[typ] = []
+            _usable[typ] = []
         _data[typ].append(item)
         _data['ALL'].append(item)
+        _usable[typ].append(Catalog.column('usable')[pos])
+        _usable['ALL'].append(Catalog.column('usable')[pos])
+    _bitsets: dict[tuple[str, int], int] = {}  # (selection, usable bit): rows
 
     def __init__(self, who: str = 'ALL', parent=None):
         super().__init__(parent)
@@ -66,27 +73,52 @@ class SplitItemModel(QAbstractListModel):
     def row(self, r: int) -> dict:
         return self._data[self._selected][r]
 
+    def usable_rows(self, vocation: str = '', sex: str = '') -> int:
+        """Bitset of the rows usable by `vocation` and `sex` ('' for anyone), see `Catalog.bitset()`."""
+        rows = (1 << self.rowCount()) - 1
+        if self._selected == SplitItemModel.available:
+            return rows
+        for x in (vocation, sex):
+            if x:
+                bit = Catalog.usable_bit(x)
+                if (bits := self._bitsets.get((self._selected, bit))) is None:
+                    usable = self._usable[self._selected]
+                    bits = self._bitsets[(self._selected, bit)] = Catalog.bitset(
+                        n for n, u in enumerate(usable) if u & bit)
+                rows &= bits
+        return rows
+
 
 class SplitItemProxy(QSortFilterProxyModel):
     def __init__(self, parent=None):
         super().__init__(parent)
         self._vocation = ''
+        self._sex = ''
+        self._accepted = None  # (model selection, `Catalog.bitset_flags()` of the rows shown), computed on first use
+
+    def _update(self):
+        self._accepted = None
+        self.invalidateFilter()
 
     def vocation(self):
         return self._vocation
 
     def set_vocation(self, voc):
         if not voc or voc in _vocations:
-            self.beginResetModel()
             self._vocation = voc
-            self.endResetModel()
+            self._update()
+
+    def set_sex(self, sex):
+        """Show only the items usable by 'MALE' or 'FEMALE' characters ('' for both)."""
+        self._sex = sex
+        self._update()
 
     def filterAcceptsRow(self, source_row, source_parent):
-        row = self.sourceModel().row(source_row)
-        try:
-            return row['usable'][self._vocation]
-        except:
-            return True
+        model = self.sourceModel()
+        if self._accepted is None or self._accepted[0] != model.selected:
+            self._accepted = model.selected, Catalog.bitset_flags(model.usable_rows(self._vocation, self._sex),
+                                                                  model.rowCount())
+        return self._accepted[1][source_row] == '1'
 
 
 if __name__ == '__main__':
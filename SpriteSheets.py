@@ -0,0 +1,206 @@
+"""
+Sprite sheet slicing index, an offline pass over the images of `Items.py`.
+
+Many `Items._item` entries share one composite image of the wiki (a single
+PNG shows 20 potions, another 10 mushrooms). This pass finds the cells of
+each composite image and writes `Sheets.py`, which `Catalog.merge()` picks up
+to give such items a 'sheet' (local image file) and a 'cell' (x, y, width,
+height crop rectangle); `Thumbnails` then decodes each sheet once and slices
+it into per-item pixmaps.
+
+Cells are found by projection: rows of pixels that all look like the
+background (the color of the top left corner, or transparent) split the
+image into bands, columns of background split each band into cells, and each
+cell is trimmed to its content. Cells are numbered in reading order and
+given to the distinct item names sharing the image in the order the image
+file name (a slug of the names) mentions them. Images whose slug does not
+mention every name in full at a position of its own (the names are
+abbreviated or merged, as in '...-elixir-...' for ten elixirs), or whose cell count does not match
+their number of names, are reported and left out: a wrong icon is worse
+than none.
+
+Run as:
+    python SpriteSheets.py [--download] [--show]
+The images are looked up in `resources/sheets/`; `--download` fetches the
+missing ones from the wiki first.
+"""
+import logging
+import os
+import re
+from os import path, replace
+from typing import Optional
+
+from PyQt6.QtGui import QImage
+
+log = logging.getLogger(__name__)
+
+_here = path.dirname(path.realpath(__file__))
+sheet_dir = path.join('resources', 'sheets')  # relative to the program directory, like Fandom 'img'
+sheets_file = path.join(_here, 'Sheets.py')
+wiki = 'https://dragonsdogma.wiki.fextralife.com'
+
+Rect = tuple[int, int, int, int]
+
+
+def _mask(image: QImage, tolerance: int) -> list[bytes]:
+    """One row of 0/1 per image row, 1 where the pixel is not background."""
+    image = image.convertToFormat(QImage.Format.Format_ARGB32)
+    width, height = image.width(), image.height()
+    data = image.constBits().asstring(image.sizeInBytes())
+    stride = image.bytesPerLine()
+    b0, g0, r0, a0 = data[0:4]
+    out = []
+    for y in range(height):
+        row = data[y * stride:y * stride + width * 4]
+        out.append(bytes(
+            0 if row[i + 3] < tolerance or (a0 >= tolerance and abs(row[i] - b0) <= tolerance and
+                                            abs(row[i + 1] - g0) <= tolerance and
+                                            abs(row[i + 2] - r0) <= tolerance) else 1
+            for i in range(0, width * 4, 4)))
+    return out
+
+
+def _runs(flags: list[bool], gap: int) -> list[tuple[int, int]]:
+    """[start, end) spans of `True` in `flags`, merging those separated by less than `gap` `False`."""
+    spans = []
+    for n, flag in enumerate(flags):
+        if not flag:
+            continue
+        if spans and n - spans[-1][1] < gap:
+            spans[-1][1] = n + 1
+        else:
+            spans.append([n, n + 1])
+    return [(a, b) for a, b in spans]
+
+
+def detect_cells(image: QImage, tolerance: int = 24, gap: int = 3, minimum: int = 8) -> list[Rect]:
+    """
+    Find the cells of a sprite sheet.
+
+    :param tolerance: color (and alpha) difference still counted as background
+    :param gap: background rows or columns needed between two cells
+    :param minimum: smaller cells (specks, captions underlines) are dropped
+    :return: (x, y, width, height) of every cell, in reading order
+    """
+    if image.isNull():
+        return []
+    mask = _mask(image, tolerance)
+    cells = []
+    for top, bottom in _runs([any(row) for row in mask], gap):
+        band = mask[top:bottom]
+        columns = [any(row[x] for row in band) for x in range(image.width())]
+        for left, right in _runs(columns, gap):
+            rows = [y for y in range(top, bottom) if any(mask[y][left:right])]
+            y0, y1 = rows[0], rows[-1] + 1
+            if right - left >= minimum and y1 - y0 >= minimum:
+                cells.append((left, y0, right - left, y1 - y0))
+    return cells
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.casefold().replace("'", '')).strip('-')
+
+
+def name_order(img: str, names) -> Optional[list[str]]:
+    """
+    Distinct `names` in the order the slug of image `img` mentions them.
+
+    :return: `None` if that order is ambiguous: a name is not mentioned in full, or two share a position
+    """
+    slug = f'-{_slug(path.splitext(path.basename(img))[0])}-'
+    positions = {name: slug.find(f'-{_slug(name)}-') for name in set(names)}
+    if -1 in positions.values() or len(set(positions.values())) < len(positions):
+        return None
+    return sorted(positions, key=positions.get)
+
+
+def local_file(img: str) -> str:
+    """Where image `img` (a wiki path) is kept, relative to the program directory."""
+    return path.join(sheet_dir, path.basename(img))
+
+
+def download(img: str) -> bool:
+    import urllib.request
+
+    fname = path.join(_here, local_file(img))
+    os.makedirs(path.dirname(fname), exist_ok=True)
+    try:
+        with urllib.request.urlopen(wiki + img, timeout=30) as fi:
+            data = fi.read()
+    except OSError as e:
+        log.warning('cannot download "%s" (%s)', img, e)
+        return False
+    with open(fname + '.tmp', 'wb') as fo:
+        fo.write(data)
+    replace(fname + '.tmp', fname)
+    return True
+
+
+def index(fetch: bool = False) -> dict[str, tuple[str, Rect]]:
+    """
+    Slice every image of `Items.py` shared by several items.
+
+    :param fetch: download the images missing from `sheet_dir`
+    :return: {item name: (sheet file, cell)}
+    """
+    import Items
+
+    by_image: dict[str, list[str]] = {}
+    for x in Items._item:
+        by_image.setdefault(x['img'], []).append(x['Name'])
+    out = {}
+    for img, names in by_image.items():
+        if len(set(names)) < 2:
+            continue
+        fname = local_file(img)
+        if (order := name_order(img, names)) is None:
+            log.warning('"%s": cannot tell which cell is which of %s, skipped', fname, sorted(set(names)))
+            continue
+        names = order
+        if not path.isfile(path.join(_here, fname)) and not (fetch and download(img)):
+            log.info('no sheet "%s"', fname)
+            continue
+        cells = detect_cells(QImage(path.join(_here, fname)))
+        if len(cells) != len(names):
+            log.warning('"%s": %d cells for %d items, skipped', fname, len(cells), len(names))
+            continue
+        out.update((name, (fname, cell)) for name, cell in zip(names, cells))
+    return out
+
+
+def write(cells: dict[str, tuple[str, Rect]], fname: str = sheets_file):
+    with open(fname + '.tmp', 'w') as fo:
+        fo.write('# Generated by SpriteSheets.py: do not edit.\n')
+        fo.write('# {item name: (sheet file, (x, y, width, height))}\n')
+        fo.write('cells = {\n')
+        for name, (sheet, cell) in sorted(cells.items()):
+            fo.write(f'    {name!r}: ({sheet!r}, {cell!r}),\n')
+        fo.write('}\n')
+    replace(fname + '.tmp', fname)
+
+
+def show(cells: dict[str, tuple[str, Rect]], sheet: Optional[str] = None):
+    by_sheet: dict[str, list] = {}
+    for name, (fname, cell) in cells.items():
+        by_sheet.setdefault(fname, []).append((cell[1], cell[0], name, cell))
+    for fname, found in sorted(by_sheet.items()):
+        if sheet is None or sheet in fname:
+            print(fname)
+            for _, _, name, cell in sorted(found):
+                print(f'    {cell}  {name}')
+
+
+if __name__ == '__main__':
+    import argparse
+    import Log
+
+    parser = argparse.ArgumentParser(description='Find the item cells of the Items.py sprite sheets')
+    parser.add_argument('--download', action='store_true', help=f'fetch missing sheets from {wiki}')
+    parser.add_argument('--show', action='store_true', help='print the cells found')
+    args = parser.parse_args()
+    Log.setup(None)
+    found = index(args.download)
+    write(found)
+    if args.show:
+        show(found)
+    print(f'{sheets_file}: {len(found)} items in {len({x[0] for x in found.values()})} sheets')
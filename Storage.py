@@ -52,7 +52,7 @@ class Storage(QWidget):
         super().__init__(*args, **kwargs)
         here = path.dirname(path.realpath('__file__'))
         uic.loadUi(path.join(here, "Storage.ui"), self)
-        self.item_model = ItemModel()
+        self.item_model = ItemModel.shared()
         self.item_proxy = ItemProxy()
         self.item_proxy.setSourceModel(self.item_model)
         self.items.setModel(self.item_proxy)
@@ -75,8 +75,11 @@ class Storage(QWidget):
 
     def set_storage_model(self, wrapper: DDDAwrapper):
         self.storage_wrapper = wrapper
-        self.storage_model = InventoryModel()
-        self.storage_proxy = InventoryProxy()
+        if self.storage_model is None:  # one per view, re-selected on every person
+            self.storage_model = InventoryModel()
+            self.storage_proxy = InventoryProxy()
+        else:
+            self.storage_model.select(None)  # until a person of the new savefile is chosen
         self.tier_delegate = TierEditDelegate(self.storage)
         self.storage_model.set_delegate(4, self.tier_delegate)
         self.storage.setItemDelegateForColumn(4, self.tier_delegate)
@@ -0,0 +1,144 @@
+"""
+Generator of synthetic, structurally valid `DDDA.sav` savefiles.
+
+The result has the real header layout, a valid checksum and the zero padding
+of a game save, and contains everything the editor reads (player, three pawns,
+four inventories and the storage) with configurable fill levels, plus filler
+sections to reach a realistic size. It allows exercising (and benchmarking)
+the whole load/edit/save path without a real game save.
+
+Run as:
+    python SyntheticSave.py [--inventory 0.5] [--storage 0.05] [--seed 1] /tmp/t/DDDA.sav
+"""
+import random
+import struct
+import zlib
+
+import Catalog
+import Checksum
+from SaveData import Header, FILE_SIZE
+
+_ROW = ('{0}<class type="sItemManager::cITEM_PARAM_DATA">\n'
+        '{0}\t<s16 name="data.mNum" value="{1}"/>\n'
+        '{0}\t<s16 name="data.mItemNo" value="{2}"/>\n'
+        '{0}\t<u32 name="data.mFlag" value="{3}"/>\n'
+        '{0}\t<u16 name="data.mChgNum" value="0"/>\n'
+        '{0}\t<u16 name="data.mDay1" value="0"/>\n'
+        '{0}\t<u16 name="data.mDay2" value="0"/>\n'
+        '{0}\t<u16 name="data.mDay3" value="0"/>\n'
+        '{0}\t<s8 name="data.mMutationPool" value="0"/>\n'
+        '{0}\t<s8 name="data.mOwnerId" value="{4}"/>\n'
+        '{0}\t<u32 name="data.mKey" value="0"/>\n'
+        '{0}</class>\n')
+
+
+class _Generator:
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        cat = Catalog.catalog()
+        self.ids = sorted(x for x, n in cat.by_id.items() if cat.sources(n) & Catalog.FROM_FANDOM)
+
+    def row(self, indent: str, full: bool, owner: int = 0) -> tuple[str, int]:
+        if not full:
+            return _ROW.format(indent, 0, -1, 0, 0), 0
+        num = self.random.choice([1, 1, 1, 2, 3, 5, 10, 99])
+        return _ROW.format(indent, num, self.random.choice(self.ids), 1, owner), num
+
+    def rows(self, indent: str, count: int, fill: float) -> tuple[list[str], int]:
+        full = set(self.random.sample(range(count), round(count * fill)))
+        rows = [self.row(indent, n in full) for n in range(count)]
+        return [x for x, _ in rows], sum(n for _, n in rows)
+
+    def person(self, name: str, attr: str) -> str:
+        s = [f'\t<class {attr}type="cSAVE_DATA_CMC">\n',
+             '\t\t<array name="(u8*)mNameStr" type="u8" count="25">\n',
+             *(f'\t\t\t<u8 value="{ord(c) if c else 0}"/>\n' for c in name[:25].ljust(25, '\0')),
+             '\t\t</array>\n',
+             '\t\t<class name="mEditPl" type="cSAVE_DATA_PARAM">\n',
+             f'\t\t\t<u8 name="mLevel" value="{self.random.randint(1, 200)}"/>\n',
+             f'\t\t\t<u8 name="mJob" value="{self.random.randint(1, 9)}"/>\n',
+             '\t\t\t<array name="mJobLevel" type="u8" count="9">\n',
+             *(f'\t\t\t\t<u8 value="{self.random.randint(1, 9)}"/>\n' for _ in range(9)),
+             '\t\t\t</array>\n',
+             '\t\t</class>\n',
+             '\t\t<array name="mEquipItem" type="class" count="12">\n',
+             *(self.row('\t\t\t', n < 11, owner=1)[0] for n in range(12)),
+             '\t\t</array>\n',
+             '\t</class>\n']
+        return ''.join(s)
+
+    def filler(self, count: int) -> str:
+        return ''.join(f'\t<class name="mWorld{k}" type="cWORLD">\n'
+                       f'\t\t<u32 name="mValue" value="{self.random.randint(0, 1 << 20)}"/>\n'
+                       f'\t\t<f32 name="mPos" value="{self.random.random():.4f}"/>\n'
+                       '\t</class>\n' for k in range(count))
+
+
+def generate_xml(inventory: float = 0.5, storage: float = 0.05, inventory_rows: int = 256,
+                 storage_rows: int = 3000, filler: int = 30000, seed: int = 1) -> bytes:
+    """
+    Build the XML of a synthetic savefile.
+
+    :param inventory: fraction of non empty rows in each of the four inventories
+    :param storage: fraction of non empty rows in the storage
+    :param inventory_rows: rows per inventory
+    :param storage_rows: rows in the storage
+    :param filler: number of filler sections (each ~100 bytes of XML)
+    :param seed: random seed, same arguments and seed give the same file
+    """
+    gen = _Generator(seed)
+    xml = ['<?xml version="1.0" encoding="utf-8"?>\n<class type="sSave::saveWork">\n',
+           gen.person('Arisen', 'name="mPl" '),
+           '\t<array name="mCmc" type="class" count="3">\n',
+           gen.person('Pawn', ''), gen.person('PawnA', ''), gen.person('PawnB', ''),
+           '\t</array>\n',
+           gen.filler(filler),
+           '\t<array name="mItem" type="class" count="4">\n']
+    for _ in range(4):
+        rows, count = gen.rows('\t\t\t\t', inventory_rows, inventory)
+        xml += ['\t\t<class type="cSAVE_DATA_ITEM">\n',
+                f'\t\t\t<u32 name="mItemCount" value="{count}"/>\n',
+                f'\t\t\t<array name="mItemList" type="class" count="{inventory_rows}">\n',
+                *rows,
+                '\t\t\t</array>\n',
+                '\t\t</class>\n']
+    rows, count = gen.rows('\t\t', storage_rows, storage)
+    xml += ['\t</array>\n',
+            f'\t<u32 name="mStorageItemCount" value="{count}"/>\n',
+            f'\t<array name="mStorageItem" type="class" count="{storage_rows}">\n',
+            *rows,
+            '\t</array>\n',
+            '</class>']
+    return ''.join(xml).encode()
+
+
+def generate(**kwargs) -> bytes:
+    """
+    Build a complete synthetic savefile image (see `generate_xml()` for arguments).
+
+    It may `raise` `ValueError` if the compressed XML does not fit in `FILE_SIZE`.
+    """
+    xml = generate_xml(**kwargs)
+    z = zlib.compress(xml)
+    h = struct.pack('<IIIIIIII', *Header(21, len(xml), len(z), 860693325, 0, 860700740, Checksum.crc32(z), 1079398965))
+    if len(h) + len(z) > FILE_SIZE:
+        raise ValueError(f'ERROR: synthetic savefile too big ({len(h) + len(z)} > {FILE_SIZE})')
+    return h + z + b'\0' * (FILE_SIZE - len(h) - len(z))
+
+
+def write(fname: str, **kwargs):
+    with open(fname, 'wb') as fo:
+        fo.write(generate(**kwargs))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate a synthetic DDDA.sav')
+    parser.add_argument('--inventory', type=float, default=0.5, help='inventory fill level (default: 0.5)')
+    parser.add_argument('--storage', type=float, default=0.05, help='storage fill level (default: 0.05)')
+    parser.add_argument('--filler', type=int, default=30000, help='filler sections (default: 30000)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('fname', help='file to write')
+    args = parser.parse_args()
+    write(args.fname, inventory=args.inventory, storage=args.storage, filler=args.filler, seed=args.seed)
@@ -0,0 +1,126 @@
+"""
+Stage level timing and allocation telemetry.
+
+A `Telemetry` collects named `Span`s (wall time and net count of allocated
+memory blocks, plus peak traced memory when `tracemalloc` capture is on) and,
+optionally, a cProfile capture of everything run inside `capture()`.
+`SaveData.load()` records one span per stage, `DDDAwrapper.adopt()` one for
+building the `PersonWrapper`s and `SaveData.to_bytes()` one per saving step;
+the result is available as `DDDAwrapper.telemetry`, in the GUI diagnostics
+dialog and from `DDDAcli --telemetry`.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+
+@dataclass
+class Span:
+    name: str
+    seconds: float
+    blocks: int                 # net change of allocated memory blocks
+    peak: Optional[int] = None  # peak traced memory (bytes), only with tracemalloc capture
+
+
+class Telemetry:
+    def __init__(self, profile: bool = False, trace: bool = False, top: int = 25):
+        """
+        :param profile: run cProfile inside `capture()`
+        :param trace: run tracemalloc inside `capture()`, recording per span memory peaks
+        :param top: number of functions kept from the profile
+        """
+        self.spans: list[Span] = []
+        self.profile = profile
+        self.trace = trace
+        self.top = top
+        self.profile_stats: list[dict] = []
+        self._open: Optional[tuple[str, float, int]] = None
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Enable the optional profilers, if requested, for the duration of the block."""
+        profiler = cProfile.Profile() if self.profile else None
+        tracing = self.trace and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            self.stop()
+            if profiler is not None:
+                profiler.disable()
+                self._keep_stats(profiler)
+            if tracing:
+                tracemalloc.stop()
+
+    def _keep_stats(self, profiler: cProfile.Profile):
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        for func in stats.fcn_list[:self.top]:
+            cc, nc, tt, ct, callers = stats.stats[func]
+            self.profile_stats.append({'function': pstats.func_std_string(func), 'calls': nc,
+                                       'tottime': tt, 'cumtime': ct})
+
+    def mark(self, name: str):
+        """Close the current span, if any, and open a new one."""
+        self.stop()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._open = (name, time.perf_counter(), sys.getallocatedblocks())
+
+    def stop(self):
+        """Close the current span, if any."""
+        if self._open is not None:
+            name, t0, blocks = self._open
+            peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            self.spans.append(Span(name, time.perf_counter() - t0, sys.getallocatedblocks() - blocks, peak))
+            self._open = None
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """Record the block as span `name`."""
+        self.mark(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    @property
+    def total(self) -> float:
+        return sum(x.seconds for x in self.spans)
+
+    def as_dict(self) -> dict:
+        out = {'total': self.total, 'spans': [asdict(x) for x in self.spans]}
+        if self.profile_stats:
+            out['profile'] = self.profile_stats
+        return out
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def summary(self) -> str:
+        """One line description, for the status bar."""
+        spans = ', '.join(f'{x.name} {x.seconds * 1000:.0f}' for x in self.spans)
+        return f'{self.total * 1000:.0f} ms ({spans})'
+
+    def format(self) -> str:
+        """Multi line report, for the diagnostics dialog."""
+        lines = [f'{"span":>20s} {"ms":>10s} {"blocks":>10s} {"peak MiB":>10s}']
+        for x in self.spans:
+            peak = f'{x.peak / 2**20:10.1f}' if x.peak is not None else f'{"":10s}'
+            lines.append(f'{x.name:>20s} {x.seconds * 1000:10.3f} {x.blocks:10d} {peak}')
+        lines.append(f'{"total":>20s} {self.total * 1000:10.3f}')
+        if self.profile_stats:
+            lines += ['', f'{"calls":>10s} {"tottime":>10s} {"cumtime":>10s}  function']
+            lines += [f'{x["calls"]:10d} {x["tottime"]:10.3f} {x["cumtime"]:10.3f}  {x["function"]}'
+                      for x in self.profile_stats]
+        return '\n'.join(lines)
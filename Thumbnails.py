@@ -0,0 +1,250 @@
+"""
+Item image thumbnails, decoded off the GUI thread.
+
+`Thumbnails.shared().get(fname, size)` never blocks: it returns the
+thumbnail if it is in the in-memory LRU cache, else schedules its production
+on the global `QThreadPool` and returns a transparent placeholder; `ready` is
+emitted once the thumbnail is available, or known to be missing: images that
+cannot be read give `None`.
+
+Workers first look in a persistent cache in `resources/thumbnails/`, keyed by
+the SHA-1 of the source file content and the size, and only decode (at the
+reduced size, which `QImageReader` does cheaply for JPEG) on a miss, saving
+the result there. Both caches are bounded: the memory one by pixel bytes, the
+disk one by total file size, oldest files going first.
+
+Items drawn in a shared sprite sheet (see `SpriteSheets`) are asked with
+`get(sheet, size, cell)`: the sheet is decoded once, kept in a small LRU of
+its own, and each cell is cropped and scaled from it, synchronously, on
+demand. `item()` picks the right call for a catalog entry.
+"""
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from os import path, replace
+from typing import Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal, pyqtSlot
+from PyQt6.QtGui import QImage, QImageReader, QPixmap, QColor
+
+log = logging.getLogger(__name__)
+
+_here = path.dirname(path.realpath(__file__))
+cache_dir = path.join(_here, 'resources', 'thumbnails')
+ICON_SIZE = 24  # thumbnails in item tables
+
+
+def _key(data: bytes, size: int) -> str:
+    return f'{hashlib.sha1(data).hexdigest()}-{size}.png'
+
+
+def _produce(fname: str, size: int, directory: str) -> Optional[QImage]:
+    """Load the `size` x `size` (at most) thumbnail of `fname`, from the disk cache if possible."""
+    try:
+        with open(fname, 'rb') as fi:
+            data = fi.read()
+    except OSError as e:
+        log.debug('no image "%s" (%s)', fname, e)
+        return None
+    cached = path.join(directory, _key(data, size))
+    image = QImage(cached)
+    if not image.isNull():
+        os.utime(cached)  # keeps it recent for `prune()`
+        return image
+    reader = QImageReader(fname)
+    source = reader.size()
+    if source.isValid():
+        reader.setScaledSize(source.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        log.warning('cannot decode "%s": %s', fname, reader.errorString())
+        return None
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = f'{cached}.{os.getpid()}.tmp'
+        if image.save(tmp, 'PNG'):
+            replace(tmp, cached)
+    except OSError as e:
+        log.warning('cannot cache thumbnail of "%s" (%s)', fname, e)
+    return image
+
+
+def prune(directory: str = cache_dir, limit: int = 64 * 2**20):
+    """Delete the least recently used thumbnails until `directory` holds at most `limit` bytes."""
+    try:
+        files = [(x.stat().st_mtime, x.stat().st_size, x.path) for x in os.scandir(directory) if x.is_file()]
+    except OSError:
+        return
+    total = sum(x[1] for x in files)
+    for mtime, size, fname in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(fname)
+            total -= size
+        except OSError:
+            pass
+
+
+class _Job(QRunnable):
+    def __init__(self, owner: 'Thumbnails', fname: str, size: int):
+        super().__init__()
+        self.owner = owner
+        self.fname = fname
+        self.size = size
+
+    def run(self):
+        image = _produce(path.join(_here, self.fname), self.size, self.owner.directory)
+        self.owner._done.emit(self.fname, self.size, image if image is not None else QImage())
+
+
+class _SheetJob(QRunnable):
+    def __init__(self, owner: 'Thumbnails', fname: str):
+        super().__init__()
+        self.owner = owner
+        self.fname = fname
+
+    def run(self):
+        image = QImage(path.join(_here, self.fname))
+        if image.isNull():
+            log.debug('no sprite sheet "%s"', self.fname)
+        self.owner._sheet_done.emit(self.fname, image)
+
+
+class Thumbnails(QObject):
+    ready = pyqtSignal(str, int)           # fname, size: `get()` now has it (or knows there is none)
+    _done = pyqtSignal(str, int, QImage)   # from the workers
+    _sheet_done = pyqtSignal(str, QImage)
+
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """Process-wide thumbnail cache."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __init__(self, directory: str = cache_dir, memory: int = 32 * 2**20, disk: int = 64 * 2**20,
+                 sheets: int = 8, pool: Optional[QThreadPool] = None, parent=None):
+        """
+        :param directory: persistent cache, `None` to disable it
+        :param memory: bytes of pixels kept in memory
+        :param disk: bytes of files kept in `directory`
+        :param sheets: decoded sprite sheets kept in memory
+        """
+        super().__init__(parent)
+        self.directory = directory
+        self.memory = memory
+        self.pool = pool or QThreadPool.globalInstance()
+        self._pixmaps: OrderedDict[tuple[str, int], tuple[QPixmap, int]] = OrderedDict()  # (pixmap, bytes)
+        self._bytes = 0
+        self._pending: set[tuple[str, int]] = set()
+        self._missing: set[tuple[str, int]] = set()
+        self._placeholders: dict[int, QPixmap] = {}
+        self.sheets = sheets
+        self._sheets: OrderedDict[str, QImage] = OrderedDict()
+        self._sheet_sizes: dict[str, set[int]] = {}  # sheets being decoded: sizes asked meanwhile
+        self._done.connect(self._on_done)
+        self._sheet_done.connect(self._on_sheet_done)
+        if directory is not None:
+            self.pool.start(lambda: prune(directory, disk))
+
+    def get(self, fname: Optional[str], size: int, cell: Optional[tuple] = None) -> Optional[QPixmap]:
+        """
+        The thumbnail of image `fname` (relative to the program directory), fitting a `size` x `size` square.
+
+        :param cell: (x, y, width, height) of the part of sprite sheet `fname` wanted, `None` for the whole image
+        :return: the thumbnail, `placeholder()` while it is being produced, `None` if there is no image
+        """
+        if not fname:
+            return None
+        key = (fname, size) if cell is None else (fname, size, cell)
+        if (cached := self._pixmaps.get(key)) is not None:
+            self._pixmaps.move_to_end(key)
+            return cached[0]
+        if key in self._missing:
+            return None
+        if cell is not None:
+            return self._slice(key)
+        if key not in self._pending:
+            self._pending.add(key)
+            self.pool.start(_Job(self, fname, size))
+        return self.placeholder(size)
+
+    def item(self, entry: dict, size: int) -> Optional[QPixmap]:
+        """Thumbnail of catalog `entry`: its own 'img', else its 'cell' of its sprite 'sheet'."""
+        pixmap = self.get(entry.get('img'), size)
+        if pixmap is None and 'sheet' in entry:
+            pixmap = self.get(entry['sheet'], size, entry['cell'])
+        return pixmap
+
+    def _slice(self, key: tuple) -> Optional[QPixmap]:
+        fname, size, (x, y, w, h) = key
+        if (fname, None) in self._missing:
+            return None
+        if (sheet := self._sheets.get(fname)) is None:
+            if fname not in self._sheet_sizes:
+                self._sheet_sizes[fname] = set()
+                self.pool.start(_SheetJob(self, fname))
+            self._sheet_sizes[fname].add(size)
+            return self.placeholder(size)
+        self._sheets.move_to_end(fname)
+        image = sheet.copy(x, y, w, h)
+        if w > size or h > size:
+            image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        return self._store(key, image)
+
+    def placeholder(self, size: int) -> QPixmap:
+        """An empty `size` x `size` pixmap, to show until the thumbnail is ready."""
+        if (pixmap := self._placeholders.get(size)) is None:
+            pixmap = self._placeholders[size] = QPixmap(size, size)
+            pixmap.fill(QColor(0, 0, 0, 0))
+        return pixmap
+
+    def clear(self):
+        """Forget the in-memory thumbnails and sprite sheets (and failures, so they will be retried)."""
+        self._pixmaps.clear()
+        self._sheets.clear()
+        self._missing.clear()
+        self._bytes = 0
+
+    @pyqtSlot(str, int, QImage)
+    def _on_done(self, fname: str, size: int, image: QImage):
+        key = (fname, size)
+        self._pending.discard(key)
+        if image.isNull():
+            self._missing.add(key)
+        else:
+            self._store(key, image)
+        self.ready.emit(fname, size)
+
+    @pyqtSlot(str, QImage)
+    def _on_sheet_done(self, fname: str, image: QImage):
+        sizes = self._sheet_sizes.pop(fname, ())
+        if image.isNull():
+            self._missing.add((fname, None))  # for all its cells
+        else:
+            self._sheets[fname] = image
+            while len(self._sheets) > self.sheets:
+                self._sheets.popitem(last=False)
+        for size in sizes:
+            self.ready.emit(fname, size)
+
+    def _store(self, key: tuple, image: QImage) -> QPixmap:
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[key] = pixmap, image.sizeInBytes()
+        self._bytes += image.sizeInBytes()
+        while self._bytes > self.memory and len(self._pixmaps) > 1:
+            _, (_, nbytes) = self._pixmaps.popitem(last=False)
+            self._bytes -= nbytes
+        return pixmap
+
+    def wait(self):
+        """Wait for the pending thumbnails (for tests and benchmarks)."""
+        self.pool.waitForDone()
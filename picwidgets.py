@@ -4,6 +4,8 @@ from PyQt6.QtCore import pyqtSignal, QPointF, QSize, Qt
 from PyQt6.QtGui import QPainter, QPixmap, QColor, QPolygonF, QMouseEvent, QBrush
 from PyQt6.QtWidgets import QAbstractButton, QWidget, QGridLayout
 
+from PixmapCache import PixmapCache
+
 
 class PicButton(QAbstractButton):
 
@@ -29,7 +31,7 @@ class PicButton(QAbstractButton):
             pixmap = QPixmap(50, 50)
             pixmap.fill(PicButton._next())
         elif isinstance(pixmap, str):
-            pixmap = QPixmap(pixmap)
+            pixmap = PixmapCache.shared().source(pixmap)
         self.pixmap = pixmap
         self.data = data
         self.border = border
@@ -39,14 +41,26 @@ class PicButton(QAbstractButton):
         self.setAutoExclusive(True)
 
     def paintEvent(self, event):
-        rect = event.rect()
+        dpr = self.devicePixelRatioF()
+        key = ('PicButton', self.pixmap.cacheKey(), self.width(), self.height(), dpr, self.border, self.isChecked())
         painter = QPainter(self)
-        if self.border > 0:
-            c = QColor('red' if self.isChecked() else 'green')
-            painter.setBrush(QBrush(c))
-            painter.drawRect(rect)
-            rect.adjust(self.border, self.border, -self.border, -self.border)
-        painter.drawPixmap(rect, self.pixmap)
+        painter.drawPixmap(0, 0, PixmapCache.shared().get(key, lambda: self._render(dpr)))
+
+    def _render(self, dpr: float) -> QPixmap:
+        """The whole button, border and scaled image, for the current size and state."""
+        out = QPixmap(self.size() * dpr)
+        out.setDevicePixelRatio(dpr)
+        out.fill(Qt.GlobalColor.transparent)
+        rect = self.rect()
+        with QPainter(out) as painter:
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, True)
+            if self.border > 0:
+                c = QColor('red' if self.isChecked() else 'green')
+                painter.setBrush(QBrush(c))
+                painter.drawRect(rect)
+                rect.adjust(self.border, self.border, -self.border, -self.border)
+            painter.drawPixmap(rect, self.pixmap)
+        return out
 
     def sizeHint(self):
         size = self.pixmap.size()
@@ -115,28 +129,31 @@ class StarRating(object):
 
     def paint(self, painter, rect, palette, is_editable=False):
         """ Paint the stars (and/or diamonds if we're in editing mode). """
-        painter.save()
-
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
-        painter.setPen(Qt.PenStyle.NoPen)
-
-        if is_editable:
-            painter.setBrush(palette.highlight())
-        else:
-            painter.setBrush(palette.windowText())
-
+        brush = palette.highlight() if is_editable else palette.windowText()
+        dpr = painter.device().devicePixelRatioF()
+        key = ('StarRating', self.star_count, self.MAX_STAR_COUNT, is_editable, brush.color().rgba(), dpr)
+        strip = PixmapCache.shared().get(key, lambda: self._render(brush, dpr, is_editable))
         y_offset = (rect.height() - self.PAINTING_SCALE_FACTOR) / 2
-        painter.translate(rect.x(), rect.y() + y_offset)
-        painter.scale(self.PAINTING_SCALE_FACTOR, self.PAINTING_SCALE_FACTOR)
-
-        for i in range(self.MAX_STAR_COUNT):
-            if i < self.star_count:
-                painter.drawPolygon(self._star_polygon, Qt.FillRule.WindingFill)
-            elif is_editable:
-                painter.drawPolygon(self._diamond_polygon, Qt.FillRule.WindingFill)
-            painter.translate(1.0, 0.0)
-
-        painter.restore()
+        painter.drawPixmap(QPointF(rect.x(), rect.y() + y_offset), strip)
+
+    def _render(self, brush, dpr, is_editable):
+        """ Pre-render the strip of stars, blitted by `paint()`. """
+        strip = QPixmap(self.sizeHint() * dpr)
+        strip.setDevicePixelRatio(dpr)
+        strip.fill(Qt.GlobalColor.transparent)
+        with QPainter(strip) as painter:
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(brush)
+            painter.scale(self.PAINTING_SCALE_FACTOR, self.PAINTING_SCALE_FACTOR)
+
+            for i in range(self.MAX_STAR_COUNT):
+                if i < self.star_count:
+                    painter.drawPolygon(self._star_polygon, Qt.FillRule.WindingFill)
+                elif is_editable:
+                    painter.drawPolygon(self._diamond_polygon, Qt.FillRule.WindingFill)
+                painter.translate(1.0, 0.0)
+        return strip
 
 
 class StarEditor(QWidget):
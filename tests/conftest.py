@@ -0,0 +1,21 @@
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+
+import SyntheticSave  # noqa: E402
+
+
+@pytest.fixture
+def savefile(request, tmp_path):
+    """
+    A small synthetic `DDDA.sav`.
+
+    Parametrize it indirectly with `SyntheticSave.write()` arguments for another size
+    (`{}` is the default, full-size synthetic save).
+    """
+    fname = str(tmp_path / 'DDDA.sav')
+    SyntheticSave.write(fname, **getattr(request, 'param', dict(inventory_rows=32, storage_rows=64, filler=10)))
+    return fname
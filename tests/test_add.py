@@ -0,0 +1,34 @@
+import pytest
+
+import Catalog
+from SaveData import SaveData, MAX_NUM
+
+
+def _rows(person, item):
+    return [x for x in person.rows if x.valid and x.item == item]
+
+
+@pytest.mark.parametrize('num', [-5, 0, MAX_NUM + 1, 100000])
+def test_add_rejects_bad_counts(savefile, num):
+    save = SaveData.load(savefile)
+    storage = save.person('Storage')
+    item = Catalog.all_by_name['Wakestone']['ID']
+    count = storage.count
+    with pytest.raises(ValueError):
+        storage.add(item, num)
+    with pytest.raises(ValueError):
+        storage.add_many([item, (item, num)])
+    assert storage.count == count
+    assert not save.dirty
+
+
+def test_add_fills_a_row_up_to_max(savefile):
+    save = SaveData.load(savefile)
+    storage = save.person('Storage')
+    item = Catalog.all_by_name['Wakestone']['ID']
+    for x in _rows(storage, item):
+        storage.row_inc(x, -x.num)
+    count = storage.count
+    storage.add(item, MAX_NUM)
+    assert [x.num for x in _rows(storage, item)] == [MAX_NUM]
+    assert storage.count == count + MAX_NUM
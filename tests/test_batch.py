@@ -0,0 +1,85 @@
+import pytest
+
+import Catalog
+from SaveData import SaveData, MAX_NUM
+
+
+def _state(save: SaveData):
+    return [(who, save.person(who).count, save.person(who).level, [(x.num, x.item) for x in save.person(who).rows])
+            for who in ('Player', 'Storage')]
+
+
+def _first(person):
+    return next(x for x in person.rows if x.valid)
+
+
+def test_nested_batches_on_different_persons_roll_back(savefile):
+    save = SaveData.load(savefile)
+    storage, player = save.person('Storage'), save.person('Player')
+    before = _state(save)
+    with pytest.raises(RuntimeError):
+        with storage.batch():
+            storage.row_inc(_first(storage), -1)
+            with player.batch():
+                player.row_inc(_first(player), -_first(player).num)
+                player.level = player.level + 1
+            storage.row_inc(_first(storage), -1)
+            raise RuntimeError('abort')
+    assert _state(save) == before
+    assert save.journal is None
+
+
+def test_failed_inner_batch_undoes_only_its_own_edits(savefile):
+    save = SaveData.load(savefile)
+    storage, player = save.person('Storage'), save.person('Player')
+    row = _first(storage)
+    num = row.num
+    player_before = _state(save)[0]
+    with storage.batch():
+        storage.row_inc(row, -1)
+        with pytest.raises(RuntimeError):
+            with player.batch():
+                player.row_inc(_first(player), -1)
+                player.level = player.level + 1
+                raise RuntimeError('abort')
+    assert _state(save)[0] == player_before
+    assert row.num == num - 1
+    assert int(row.fields['data.mNum'].get('value')) == num - 1
+
+
+def _edit(save: SaveData):
+    storage, player = save.person('Storage'), save.person('Player')
+    item = Catalog.all_by_name['Wakestone']['ID']
+    with storage.batch():
+        storage.row_inc(_first(storage), 1)
+        storage.add_many([item, (item, 3)])
+        with player.batch():
+            player.row_inc(_first(player), -1)
+            player.level = player.level + 1
+
+
+def test_lazy_save_is_identical_to_full_save(savefile):
+    lazy, full = SaveData.load(savefile, lazy=True), SaveData.load(savefile, lazy=False)
+    _edit(lazy)
+    _edit(full)
+    assert lazy.to_bytes() == full.to_bytes()
+    assert lazy.to_bytes() != SaveData.load(savefile).to_bytes()
+
+
+def test_add_merges_up_to_max_then_opens_a_row(savefile):
+    save = SaveData.load(savefile)
+    storage = save.person('Storage')
+    item = Catalog.all_by_name['Wakestone']['ID']
+    with storage.batch():
+        for x in storage.rows:
+            if x.valid and x.item == item:
+                storage.row_inc(x, -x.num)
+        count = storage.count
+        first = storage.add(item, MAX_NUM - 1)
+        assert storage.add(item, 1) == first
+        second = storage.add(item, 1)
+        assert second not in (first, -1)
+        merged, third = storage.add_many([(item, MAX_NUM - 1), (item, 1)])
+        assert merged == second and third not in (first, second, -1)
+    assert [storage.rows[x].num for x in (first, second, third)] == [MAX_NUM, MAX_NUM, 1]
+    assert storage.count == count + 2 * MAX_NUM + 1
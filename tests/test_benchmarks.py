@@ -0,0 +1,192 @@
+"""
+Benchmarks for the performance sensitive parts of DDDAedit, on a full-size synthetic savefile.
+
+They need `pytest-benchmark` (skipped otherwise). Record a run and flag regressions against it with:
+    python -m pytest tests/test_benchmarks.py --benchmark-autosave
+    python -m pytest tests/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:25%
+"""
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import Catalog  # noqa: E402
+import Checksum  # noqa: E402
+from DDDAwrapper import DDDAwrapper  # noqa: E402
+from SaveData import SaveData  # noqa: E402
+
+full_size = pytest.mark.parametrize('savefile', [{}], indirect=True, ids=['synthetic'])
+modes = pytest.mark.parametrize('lazy', [False, True], ids=['full', 'lazy'])
+
+
+@pytest.fixture(scope='module')
+def app():
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+    app.processEvents()
+
+
+def _load(fname: str, lazy: bool) -> DDDAwrapper:
+    wrapper = DDDAwrapper()
+    with contextlib.redirect_stdout(io.StringIO()):
+        wrapper.from_file(fname, lazy=lazy)
+    return wrapper
+
+
+@pytest.mark.parametrize('name', list(Checksum.engines))
+def test_crc(benchmark, name):
+    """All checksum engines on a buffer as big as the largest possible payload."""
+    buf = os.urandom(524288 - 32)
+    func = Checksum.engines[name]
+    benchmark.extra_info['bytes'] = len(buf)
+    if name == 'reference':
+        result = benchmark.pedantic(func, (buf,), rounds=1)
+    else:
+        result = benchmark(func, buf)
+    assert result == Checksum.crc32_reference(buf)
+
+
+@full_size
+@modes
+def test_load(benchmark, savefile, lazy):
+    """Full DOM and lazy (section scoped) loading."""
+    tracemalloc.start()
+    wrapper = _load(savefile, lazy)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del wrapper
+    benchmark.extra_info.update(peak_mib=peak / 2**20, retained_mib=current / 2**20)
+    benchmark.pedantic(_load, (savefile, lazy), rounds=3)
+
+
+@full_size
+@modes
+def test_stages(benchmark, savefile, lazy):
+    """Each loading stage (see `SaveData.stages`) and the construction of the `PersonWrapper`s."""
+    best = {}
+
+    def load():
+        marks = []
+        save = SaveData.load(savefile, lazy, progress=lambda n, stage: marks.append((stage, time.perf_counter())))
+        marks.append(('end', time.perf_counter()))
+        wrapper = DDDAwrapper()
+        with contextlib.redirect_stdout(io.StringIO()):
+            marks.append(('persons', time.perf_counter()))
+            wrapper.adopt(save)
+            marks.append(('end', time.perf_counter()))
+        for (stage, t0), (_, t1) in zip(marks, marks[1:]):
+            if stage != 'end':
+                best[stage] = min(best.get(stage, t1 - t0), t1 - t0)
+
+    benchmark.pedantic(load, rounds=3)
+    benchmark.extra_info.update((f'{stage} ms', seconds * 1000) for stage, seconds in best.items())
+    assert 'persons' in best
+
+
+@full_size
+@modes
+def test_save(benchmark, savefile, lazy, tmp_path):
+    """Full re-serialization and incremental byte patching after a single edit."""
+    wrapper = _load(savefile, lazy)
+    storage = wrapper.person('Storage')
+    n, row = next((n, x) for n, x in enumerate(storage.rows) if x.valid)
+    num = row.num
+    storage.row_inc(row, 1)
+    out = str(tmp_path / 'out.sav')
+    benchmark.pedantic(wrapper.to_file, (out,), rounds=3)
+    assert _load(out, lazy).person('Storage').rows[n].num == num + 1
+
+
+@full_size
+@modes
+def test_diff(benchmark, savefile, lazy, app):
+    """The whole diff after many edits; memory held for the diff baseline."""
+    tracemalloc.start()
+    wrapper = _load(savefile, lazy)
+    loaded, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    storage = wrapper.person('Storage')
+    for row in storage.rows[:1000]:
+        storage.row_inc(row, 1)
+    tracemalloc.start()
+    rows = len(list(wrapper.diff()))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    benchmark.extra_info.update(rows=rows, loaded_mib=loaded / 2**20, diff_peak_mib=peak / 2**20)
+    benchmark.pedantic(lambda: list(wrapper.diff()), rounds=3)
+    assert rows
+
+
+@full_size
+@modes
+def test_diff_open_tab(benchmark, savefile, lazy, app):
+    """Opening the Diff tab after many edits."""
+    from DiffModel import DiffModel
+
+    wrapper = _load(savefile, lazy)
+    storage = wrapper.person('Storage')
+    for row in storage.rows[:1000]:
+        storage.row_inc(row, 1)
+    model = DiffModel()
+
+    def open_tab():
+        model.select(wrapper.diff())
+        model.fetchMore()  # what the view does to fill its viewport
+
+    benchmark.pedantic(open_tab, rounds=3)
+
+
+@pytest.fixture
+def inventory(savefile, app):
+    """The Storage inventory table, as the Storage tab shows it."""
+    from InventoryModel import InventoryModel, InventoryProxy
+
+    wrapper = _load(savefile, True)
+    model = InventoryModel()
+    model.select(wrapper.person('Storage'))
+    proxy = InventoryProxy()
+    proxy.setSourceModel(model)
+    return wrapper, model, proxy
+
+
+@full_size
+def test_inventory_filter(benchmark, inventory):
+    _, model, proxy = inventory
+
+    def refilter():
+        proxy.invalidate()
+        return proxy.rowCount()
+
+    assert 0 < benchmark.pedantic(refilter, rounds=3) <= model.rowCount()
+
+
+@full_size
+def test_inventory_sort(benchmark, inventory):
+    from PyQt6.QtCore import Qt
+
+    _, model, proxy = inventory
+
+    def sort():
+        for column in range(model.columnCount()):
+            proxy.sort(column, Qt.SortOrder.AscendingOrder)
+            proxy.sort(column, Qt.SortOrder.DescendingOrder)
+
+    benchmark.pedantic(sort, rounds=3)
+
+
+@full_size
+def test_inventory_bulk_add(benchmark, savefile):
+    items = [x['ID'] for x in Catalog.all_by_id.values()][:500]
+
+    def setup():
+        return (_load(savefile, True).person('Storage'),), {}
+
+    benchmark.extra_info['items'] = len(items)
+    benchmark.pedantic(lambda storage: storage.add_many(items), setup=setup, rounds=3)
@@ -0,0 +1,85 @@
+import json
+import shutil
+import struct
+import zlib
+
+import pytest
+
+import Checksum
+import DDDAcli
+
+
+def test_empty_file_is_reported(tmp_path):
+    fname = tmp_path / 'empty.sav'
+    fname.write_bytes(b'')
+    result = DDDAcli.process('check', str(fname), {})
+    assert not result['ok']
+    assert result['error'].startswith('ERROR:')
+
+
+def test_corrupted_body_is_reported(savefile):
+    # garbage with a matching checksum, so that inflating fails
+    with open(savefile, 'r+b') as fo:
+        header = list(struct.unpack('<IIIIIIII', fo.read(32)))
+        body = bytes(header[2])
+        header[6] = Checksum.crc32(body)
+        fo.seek(0)
+        fo.write(struct.pack('<IIIIIIII', *header) + body)
+    result = DDDAcli.process('inspect', savefile, {})
+    assert not result['ok']
+    assert result['error'].startswith('ERROR: corrupted data')
+
+
+def test_bad_operation_is_reported(savefile):
+    result = DDDAcli.process('apply', savefile, {'script': [5], 'backup': False})
+    assert not result['ok']
+    assert 'operation 0' in result['error']
+
+
+@pytest.mark.parametrize('script', [[5], [{'add': 'Wakestone'}], {'person': 'Player'}])
+def test_bad_script_is_rejected(tmp_path, savefile, script, capsys):
+    fname = tmp_path / 'script.json'
+    fname.write_text(json.dumps(script))
+    with pytest.raises(SystemExit) as e:
+        DDDAcli.main(['apply', '--no-backup', str(fname), savefile])
+    assert e.value.code == 2
+    assert 'edit script' in capsys.readouterr().err
+
+
+def test_output_keeps_the_tree(tmp_path, savefile, capsys):
+    for sub in ('a', 'b'):
+        (tmp_path / sub).mkdir()
+        shutil.copy(savefile, tmp_path / sub / 'DDDA.sav')
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([{'person': 'Player', 'level': 10}]))
+    out = tmp_path / 'out'
+    assert DDDAcli.main(['-j', '1', 'apply', '--output', str(out), str(script),
+                         str(tmp_path / 'a'), str(tmp_path / 'b')]) == 0
+    assert sorted(json.loads(x)['output'] for x in capsys.readouterr().out.splitlines()) == \
+        [str(out / 'a' / 'DDDA.sav'), str(out / 'b' / 'DDDA.sav')]
+
+
+def test_output_refuses_duplicate_destinations(tmp_path, savefile, capsys):
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([{'person': 'Player', 'level': 10}]))
+    with pytest.raises(SystemExit) as e:
+        DDDAcli.main(['apply', '--output', str(tmp_path / 'out'), str(script), savefile, savefile])
+    assert e.value.code == 2
+    assert 'both be written' in capsys.readouterr().err
+
+
+def test_missing_sections_are_reported(tmp_path):
+    fname = tmp_path / 'DDDA.sav'
+    body = zlib.compress(b'<class type="sSave::saveWork"/>')
+    fname.write_bytes(struct.pack('<IIIIIIII', 21, 31, len(body), 0, 0, 0, Checksum.crc32(body), 0) + body)
+    result = DDDAcli.process('inspect', str(fname), {})
+    assert not result['ok']
+    assert result['error'].startswith('ERROR: not a savefile, missing mPl')
+
+
+@pytest.mark.parametrize('op', [{'level': 999}, {'level': 0}, {'vocation': 10}, {'vocation_level': 10},
+                                {'add': 'Wakestone', 'num': -5}, {'add': 'Wakestone', 'num': 100000}])
+def test_out_of_range_values_are_reported(savefile, op):
+    result = DDDAcli.process('apply', savefile, {'script': [dict(op, person='Player')], 'backup': False})
+    assert not result['ok']
+    assert 'range' in result['error']